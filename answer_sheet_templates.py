@@ -0,0 +1,284 @@
+"""
+答案卷版面範本
+固定格式的答案卷（例如大考作答區的格線）只需偵測一次版面：
+由空白（或任一份）答案卷找出格線，記錄每一行（或每一格）作答區的位置，
+之後的頁面只要對齊到範本，就能把作答區直接送進辨識器，略過 CRAFT 文字偵測。
+
+對不上任何範本的頁面（格線數量、位置或比例不符）仍會進行完整的文字偵測。
+寫在作答區格線之外的文字不會被辨識，僅適用於只需批改作答區的答案卷。
+
+使用方式：
+    registry = AnswerSheetRegistry('models/answer_sheets')
+    registry.register('原卷1-1', load_pdf_pages('原卷1-1.pdf')[0])
+    system = EssayGradingSystem(templates=registry)
+"""
+
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+# 版面偵測參數
+DEFAULT_LAYOUT_PARAMS = {
+    'line_length': 0.125,        # 格線最短長度（相對於頁寬／頁高）
+    'line_coverage': 0.5,        # 格線至少涵蓋作答區寬度（高度）的比例
+    'line_downsample': 8,        # 偵測格線時沿線的方向縮小的倍數
+    'min_row_height': 0.01,      # 作答行最小高度（相對於頁高），較窄的間隔視為雙線
+    'match_tolerance': 0.01,     # 格線相對位置的容許誤差（相對於作答區大小）
+    'aspect_tolerance': 0.03,    # 作答區長寬比的容許相對誤差
+    'min_ink_ratio': 0.002,      # 作答區內墨跡比例低於此值視為未作答，不送辨識
+}
+
+
+def _line_runs(coverage, threshold: float) -> List[Tuple[int, int]]:
+    """coverage 中連續超過門檻的區間 [(起, 迄)]（含迄）"""
+    import numpy as np
+    
+    above = np.concatenate(([False], coverage >= threshold, [False]))
+    edges = np.flatnonzero(np.diff(above.astype(np.int8)))
+    return [(int(start), int(end) - 1) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def _analyze(binary, params: Dict):
+    """
+    找出二值化頁面（白底黑字）的格線
+    
+    返回 (版面, 格線遮罩)；找不到至少兩條橫線時版面為 None。
+    版面座標皆以作答區外框（所有格線的外接矩形）為基準正規化到 [0, 1]：
+    {
+        'frame': (x0, y0, x1, y1) 外框像素座標,
+        'rules': 橫線位置, 'columns': 直線位置,
+        'boxes': 作答區 [[左, 右, 上, 下], ...]（由上而下、由左而右）
+    }
+    """
+    import cv2
+    import numpy as np
+    
+    h, w = binary.shape[:2]
+    _, ink = cv2.threshold(binary, 127, 255, cv2.THRESH_BINARY_INV)
+    
+    # 以細長的結構元素做 opening，只留下長橫線與長直線；
+    # 先沿線的方向縮小（垂直於線的方向不縮），結構元素可縮短為 1/factor
+    factor = params['line_downsample']
+    kernel_w = max(10, int(w * params['line_length']))
+    kernel_h = max(10, int(h * params['line_length']))
+    
+    def long_lines(axis):
+        if axis == 0:
+            small_size, kernel = (max(1, w // factor), h), (max(1, kernel_w // factor), 1)
+        else:
+            small_size, kernel = (w, max(1, h // factor)), (1, max(1, kernel_h // factor))
+        small = cv2.resize(ink, small_size, interpolation=cv2.INTER_AREA)
+        _, small = cv2.threshold(small, 127, 255, cv2.THRESH_BINARY)
+        small = cv2.morphologyEx(small, cv2.MORPH_OPEN, cv2.getStructuringElement(cv2.MORPH_RECT, kernel))
+        return cv2.bitwise_and(cv2.resize(small, (w, h), interpolation=cv2.INTER_NEAREST), ink)
+    
+    horizontal = long_lines(0)
+    vertical = long_lines(1)
+    lines = cv2.bitwise_or(horizontal, vertical)
+    
+    points = cv2.findNonZero(lines)
+    if points is None:
+        return None, lines
+    x0, y0, frame_w, frame_h = cv2.boundingRect(points)
+    if frame_w < kernel_w or frame_h < kernel_h:
+        return None, lines
+    
+    rules = _line_runs(np.count_nonzero(horizontal, axis=1), params['line_coverage'] * frame_w)
+    if len(rules) < 2:
+        return None, lines
+    columns = _line_runs(np.count_nonzero(vertical, axis=0), params['line_coverage'] * frame_h)
+    
+    # 相鄰橫線之間為作答行（過窄者為雙線，略過）
+    rows = [
+        (top_end + 1, bottom_start - 1)
+        for (_, top_end), (bottom_start, _) in zip(rules, rules[1:])
+        if bottom_start - top_end - 1 >= params['min_row_height'] * h
+    ]
+    
+    # 直線之間為欄；欄寬與行高相近時為稿紙方格，整行一起辨識，否則逐格辨識
+    cells = [
+        (left_end + 1, right_start - 1)
+        for (_, left_end), (right_start, _) in zip(columns, columns[1:])
+        if right_start - left_end - 1 > 0
+    ]
+    if rows and cells:
+        row_height = float(np.median([bottom - top for top, bottom in rows]))
+        cell_width = float(np.median([right - left for left, right in cells]))
+        if cell_width < 2 * row_height:
+            cells = []
+    if not cells:
+        cells = [(x0, x0 + frame_w - 1)]
+    
+    def nx(x):
+        return (x - x0) / frame_w
+    
+    def ny(y):
+        return (y - y0) / frame_h
+    
+    layout = {
+        'frame': (x0, y0, x0 + frame_w, y0 + frame_h),
+        'rules': [ny((start + end) / 2) for start, end in rules],
+        'columns': [nx((start + end) / 2) for start, end in columns],
+        'boxes': [
+            [nx(left), nx(right + 1), ny(top), ny(bottom + 1)]
+            for top, bottom in rows
+            for left, right in cells
+        ]
+    }
+    return layout, lines
+
+
+def detect_layout(binary, params: Optional[Dict] = None) -> Optional[Dict]:
+    """偵測二值化頁面的作答區版面（格式見 _analyze）；找不到格線時返回 None"""
+    layout, _ = _analyze(binary, params or DEFAULT_LAYOUT_PARAMS)
+    return layout
+
+
+class AnswerSheetTemplate:
+    """一種答案卷的作答區版面"""
+    
+    def __init__(self, name: str, rules: List[float], columns: List[float],
+                 boxes: List[List[float]], aspect: float):
+        self.name = name
+        self.rules = rules
+        self.columns = columns
+        self.boxes = boxes
+        self.aspect = aspect
+    
+    @classmethod
+    def from_layout(cls, name: str, layout: Dict) -> 'AnswerSheetTemplate':
+        x0, y0, x1, y1 = layout['frame']
+        return cls(name, layout['rules'], layout['columns'], layout['boxes'], (x1 - x0) / (y1 - y0))
+    
+    def matches(self, layout: Dict, params: Dict) -> bool:
+        """頁面版面是否與範本相同（格線數量一致，且相對位置與長寬比在容許誤差內）"""
+        x0, y0, x1, y1 = layout['frame']
+        if abs((x1 - x0) / (y1 - y0) / self.aspect - 1) > params['aspect_tolerance']:
+            return False
+        
+        for expected, found in ((self.rules, layout['rules']), (self.columns, layout['columns'])):
+            if len(expected) != len(found):
+                return False
+            if any(abs(a - b) > params['match_tolerance'] for a, b in zip(expected, found)):
+                return False
+        return True
+    
+    def boxes_for(self, frame: Tuple[int, int, int, int]) -> List[List[int]]:
+        """將作答區換算到頁面的像素座標（EasyOCR horizontal_list 格式 [x_min, x_max, y_min, y_max]）"""
+        x0, y0, x1, y1 = frame
+        frame_w, frame_h = x1 - x0, y1 - y0
+        return [
+            [int(round(x0 + left * frame_w)), int(round(x0 + right * frame_w)),
+             int(round(y0 + top * frame_h)), int(round(y0 + bottom * frame_h))]
+            for left, right, top, bottom in self.boxes
+        ]
+    
+    def to_dict(self) -> Dict:
+        return {
+            'name': self.name,
+            'rules': self.rules,
+            'columns': self.columns,
+            'boxes': self.boxes,
+            'aspect': self.aspect
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'AnswerSheetTemplate':
+        return cls(data['name'], data['rules'], data['columns'], data['boxes'], data['aspect'])
+
+
+class AnswerSheetRegistry:
+    """
+    答案卷範本登錄表
+    
+    指定 template_dir 時，登錄的範本會存成 JSON，下次建立時自動載入，
+    每種答案卷只需偵測一次版面。
+    """
+    
+    def __init__(self, template_dir: Optional[str] = None, params: Optional[Dict] = None):
+        """
+        template_dir: 範本存放資料夾（None 表示只保留在記憶體中）
+        params: 版面偵測與比對參數（預設為 DEFAULT_LAYOUT_PARAMS）
+        """
+        self.template_dir = template_dir
+        self.params = dict(DEFAULT_LAYOUT_PARAMS, **(params or {}))
+        self.templates: Dict[str, AnswerSheetTemplate] = {}
+        
+        if template_dir is not None and os.path.isdir(template_dir):
+            for filename in sorted(os.listdir(template_dir)):
+                if filename.endswith('.json'):
+                    with open(os.path.join(template_dir, filename), 'r', encoding='utf-8') as f:
+                        template = AnswerSheetTemplate.from_dict(json.load(f))
+                    self.templates[template.name] = template
+    
+    def __len__(self) -> int:
+        return len(self.templates)
+    
+    def register(self, name: str, image, preprocess_params: Optional[Dict] = None) -> AnswerSheetTemplate:
+        """
+        由一張答案卷（最好是空白卷）偵測版面並登錄為範本
+        
+        image: 圖片路徑或圖片陣列，會先經過與辨識時相同的前處理
+        preprocess_params: 前處理參數（須與 EssayGradingSystem.preprocess_params 一致）
+        
+        找不到作答區格線時拋出 ValueError
+        """
+        from essay_grading_system import EssayGradingSystem
+        
+        img = EssayGradingSystem._load_image(image)
+        binary, _ = EssayGradingSystem._preprocess_array(img, preprocess_params)
+        
+        layout = detect_layout(binary, self.params)
+        if layout is None or not layout['boxes']:
+            raise ValueError(f"找不到作答區格線：{name}")
+        
+        template = AnswerSheetTemplate.from_layout(name, layout)
+        self.templates[name] = template
+        
+        if self.template_dir is not None:
+            os.makedirs(self.template_dir, exist_ok=True)
+            filename = hashlib.sha256(name.encode('utf-8')).hexdigest()[:16] + '.json'
+            with open(os.path.join(self.template_dir, filename), 'w', encoding='utf-8') as f:
+                json.dump(template.to_dict(), f, ensure_ascii=False, indent=2)
+        
+        return template
+    
+    def match(self, binary) -> Optional[Tuple[AnswerSheetTemplate, List[List[int]], object]]:
+        """
+        將前處理後的頁面對齊到範本
+        
+        返回 (範本, 有作答的作答區像素座標, 去除格線後的頁面)；對不上任何範本時返回 None
+        """
+        import cv2
+        
+        if not self.templates:
+            return None
+        
+        layout, lines = _analyze(binary, self.params)
+        if layout is None:
+            return None
+        
+        template = next((t for t in self.templates.values() if t.matches(layout, self.params)), None)
+        if template is None:
+            return None
+        
+        # 去除格線，避免辨識器把格線當成筆畫
+        cleaned = cv2.bitwise_or(binary, lines)
+        
+        boxes = []
+        for box in template.boxes_for(layout['frame']):
+            x_min, x_max, y_min, y_max = box
+            region = cleaned[y_min:y_max, x_min:x_max]
+            if region.size and (region < 128).mean() >= self.params['min_ink_ratio']:
+                boxes.append(box)
+        
+        return template, boxes, cleaned
+    
+    def fingerprint(self) -> str:
+        """範本與參數的摘要（辨識結果依範本而不同，作為 OCR 快取鍵的一部分）"""
+        data = {
+            'params': self.params,
+            'templates': [self.templates[name].to_dict() for name in sorted(self.templates)]
+        }
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode('utf-8')).hexdigest()
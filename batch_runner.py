@@ -0,0 +1,235 @@
+"""
+可中斷續跑的批次批改
+每批改完一篇作文就立即寫入 JSONL 結果檔並記錄到 manifest，
+程式中斷後重新執行時會略過 manifest 中已完成的檔案。
+"""
+
+import json
+import os
+from typing import Callable, Dict, Iterator, List, Optional
+
+from essay_grading_system import EssayGradingSystem, UnreadablePageError
+
+
+class BatchGradingRunner:
+    """
+    批次批改執行器
+    
+    輸出資料夾內容：
+    - results.jsonl：每篇作文一行評分結果（依完成順序附加）
+    - manifest.txt：已完成的輸入檔案，每行一個
+    - errors.jsonl：批改失敗的檔案與錯誤訊息，需重新掃描者另含分流報告 'triage'（不列入 manifest，下次會重試）
+    """
+    
+    def __init__(self, system: EssayGradingSystem,
+                 output_dir: str = 'results/batch',
+                 chunk_size: int = 8,
+                 workers: int = 0,
+                 fsync: bool = True,
+                 profile: bool = False):
+        """
+        system: 批改系統
+        output_dir: 結果輸出資料夾
+        chunk_size: 每批送入 ICR 模型的頁數
+        workers: 前處理子行程數量（同 EssayGradingSystem.grade_essays）
+        fsync: 每篇寫入後是否強制寫入磁碟（斷電時也不遺失已完成的結果）
+        profile: 使用 system.profiler 剖析；依篇數選取的作文單獨批改（不跨頁批次辨識），
+                 每份剖析結果只涵蓋一篇作文，其餘作文照常批次批改。
+                 設定 slow_threshold 時需逐篇計時，所有作文都單獨批改（不使用批次辨識）
+        """
+        if profile and system.profiler is None:
+            raise ValueError("profile=True 需要先設定 system.profiler")
+        
+        self.system = system
+        self.output_dir = output_dir
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.fsync = fsync
+        self.profile = profile
+        
+        self.results_path = os.path.join(output_dir, 'results.jsonl')
+        self.manifest_path = os.path.join(output_dir, 'manifest.txt')
+        self.errors_path = os.path.join(output_dir, 'errors.jsonl')
+        
+        os.makedirs(output_dir, exist_ok=True)
+    
+    def completed(self) -> set:
+        """已完成的輸入檔案"""
+        if not os.path.exists(self.manifest_path):
+            return set()
+        with open(self.manifest_path, 'r', encoding='utf-8') as f:
+            return {line.rstrip('\n') for line in f if line.endswith('\n')}
+    
+    def run(self, image_paths: List[str],
+            on_result: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+        """
+        批改所有尚未完成的作文
+        
+        on_result: 每完成（或失敗）一篇時呼叫 on_result(image_path, result)，可用於顯示進度
+        
+        返回：{'total': 輸入數, 'skipped': 已完成略過數, 'graded': 本次完成數, 'failed': 失敗數}
+        """
+        done = self.completed()
+        todo = [path for path in image_paths if path not in done]
+        summary = {'total': len(image_paths), 'skipped': len(image_paths) - len(todo), 'graded': 0, 'failed': 0}
+        
+        if not todo:
+            return summary
+        
+        # 上次中斷時可能留下寫到一半的行
+        for path in (self.results_path, self.manifest_path, self.errors_path):
+            _truncate_partial_line(path)
+        
+        with open(self.results_path, 'a', encoding='utf-8') as results_file, \
+                open(self.manifest_path, 'a', encoding='utf-8') as manifest_file, \
+                open(self.errors_path, 'a', encoding='utf-8') as errors_file:
+            
+            if self.profile:
+                graded = self._iter_grade_profiled(todo)
+            else:
+                graded = self.system.iter_grade_essays(
+                    todo,
+                    chunk_size=self.chunk_size,
+                    workers=self.workers
+                )
+            
+            for image_path, result in zip(todo, graded):
+                if 'error' in result:
+                    # 需重新掃描的頁面附上分流報告（判斷原因與量測值）
+                    error = {'file': image_path, 'error': result['error']}
+                    if result.get('triage') is not None:
+                        error['triage'] = result['triage']
+                    self._append(errors_file, json.dumps(error, ensure_ascii=False))
+                    summary['failed'] += 1
+                else:
+                    # 先寫結果再記錄 manifest：中斷於兩者之間時，該篇會重新批改，
+                    # 重複的結果由 iter_results 以最後一筆為準
+                    self._append(results_file, json.dumps(_to_record(image_path, result), ensure_ascii=False))
+                    self._append(manifest_file, image_path)
+                    summary['graded'] += 1
+                
+                if on_result is not None:
+                    on_result(image_path, result)
+        
+        return summary
+    
+    def _iter_grade_profiled(self, image_paths: List[str]) -> Iterator[Dict]:
+        """
+        剖析模式的批改，依輸入順序產出結果（同 iter_grade_essays）
+        
+        剖析器依篇數選中的作文單獨批改；兩篇選中作文之間的作文合為一段批次批改（不剖析）。
+        設定 slow_threshold 時每篇都單獨批改，逐篇判斷是否超過門檻
+        """
+        profiler = self.system.profiler
+        batch: List[str] = []
+        
+        for image_path in image_paths:
+            if profiler.slow_threshold is None and not profiler.is_sampled(offset=len(batch)):
+                batch.append(image_path)
+                continue
+            
+            yield from self._iter_grade_batch(batch)
+            batch = []
+            try:
+                yield self.system.grade_essay_from_image(image_path)
+            except UnreadablePageError as e:
+                self.system.metrics.inc('essays_failed')
+                yield {'image_path': image_path, 'error': str(e), 'triage': e.triage}
+            except Exception as e:
+                self.system.metrics.inc('essays_failed')
+                yield {'image_path': image_path, 'error': str(e)}
+        
+        yield from self._iter_grade_batch(batch)
+    
+    def _iter_grade_batch(self, image_paths: List[str]) -> Iterator[Dict]:
+        """批次批改一段不剖析的作文（先佔用剖析器的序號，之後選取的作文序號才正確）"""
+        if not image_paths:
+            return
+        
+        self.system.profiler.skip(len(image_paths))
+        yield from self.system.iter_grade_essays(
+            image_paths,
+            chunk_size=self.chunk_size,
+            workers=self.workers
+        )
+    
+    def _append(self, f, line: str):
+        f.write(line + '\n')
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+    
+    def iter_results(self) -> Iterator[Dict]:
+        """逐筆讀取已完成的結果（同一檔案有多筆時只保留最後一筆）"""
+        if not os.path.exists(self.results_path):
+            return
+        
+        latest: Dict[str, int] = {}
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f):
+                if line.endswith('\n'):
+                    latest[json.loads(line)['file']] = line_number
+        
+        keep = set(latest.values())
+        with open(self.results_path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f):
+                if line_number in keep:
+                    yield json.loads(line)
+    
+    def to_dataframe(self):
+        """將已完成的結果載入為 pandas DataFrame"""
+        import pandas as pd
+        
+        return pd.DataFrame(list(self.iter_results()))
+
+
+def _to_record(image_path: str, result: Dict) -> Dict:
+    """整理成一行結果記錄"""
+    scores = result['scores']
+    features = result['features']
+    return {
+        'file': image_path,
+        'total_score': scores['total'],
+        'grade': scores['grade'],
+        'content': scores['content'],
+        'structure': scores['structure'],
+        'grammar': scores['grammar'],
+        'vocabulary': scores['vocabulary'],
+        'char_count': features['char_count'],
+        'word_count': features['word_count'],
+        'sentence_count': features['sentence_count'],
+        'paragraph_count': features['paragraph_count'],
+        'vocabulary_richness': features['vocabulary_richness'],
+        'avg_sentence_length': features['avg_sentence_length'],
+        'punctuation_count': features['punctuation_count'],
+        'confidence': float(result['icr_result']['confidence']),
+        'text': result['text']
+    }
+
+
+def _truncate_partial_line(path: str):
+    """移除檔案結尾不完整的一行"""
+    if not os.path.exists(path):
+        return
+    
+    with open(path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        
+        # 從結尾往回找最後一個換行
+        position = size
+        while position > 0:
+            step = min(4096, position)
+            f.seek(position - step)
+            chunk = f.read(step)
+            index = chunk.rfind(b'\n')
+            if index != -1:
+                end = position - step + index + 1
+                if end != size:
+                    f.truncate(end)
+                return
+            position -= step
+        
+        f.truncate(0)
@@ -0,0 +1,103 @@
+"""
+作文特徵擷取效能比較
+
+比較 analyze_essay 與舊版多次掃描實作（含文法評分時的標點重複計數）
+在不同長度作文上的執行時間，並確認兩者輸出一致。
+
+執行方式：python benchmarks/bench_features.py
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from essay_grading_system import EssayGradingSystem
+
+# 常用字（合成作文用）
+COMMON_CHARS = (
+    "的一是在不了有和人這中大為上個國我以要他時來用們生到作地於出就分對成會可主"
+    "發年動同工也能下過子說產種面而方後多定行學法所民得經十三之進著等部度家電力"
+    "裡如水化高自二理起小物現實加量都兩體制機當使點從業本去把性好應開它合還因由"
+)
+
+
+def legacy_analyze_essay(text):
+    """舊版 analyze_essay（多次掃描全文），加上舊版文法評分的標點計數"""
+    char_count = len(text)
+    word_count = len(text.split())
+    
+    sentences = re.split(r'[。！？.!?]', text)
+    sentences = [s.strip() for s in sentences if s.strip()]
+    sentence_count = len(sentences)
+    
+    paragraphs = text.split('\n')
+    paragraphs = [p.strip() for p in paragraphs if p.strip()]
+    paragraph_count = len(paragraphs)
+    
+    words = text.split()
+    unique_words = set(words)
+    ttr = len(unique_words) / len(words) if words else 0
+    
+    avg_sentence_length = char_count / sentence_count if sentence_count > 0 else 0
+    
+    punctuation_count = sum(text.count(p) for p in '，。！？、；：')
+    
+    return {
+        'char_count': char_count,
+        'word_count': word_count,
+        'sentence_count': sentence_count,
+        'paragraph_count': paragraph_count,
+        'vocabulary_richness': ttr,
+        'avg_sentence_length': avg_sentence_length,
+        'punctuation_count': punctuation_count
+    }
+
+
+def synthetic_essay(n_words, seed=0):
+    """產生含標點、空白與換行的合成作文"""
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(n_words):
+        parts.append(''.join(rng.choice(COMMON_CHARS) for _ in range(rng.randint(1, 6))))
+        r = rng.random()
+        if r < 0.30:
+            parts.append('，')
+        elif r < 0.40:
+            parts.append('。')
+        elif r < 0.42:
+            parts.append('！')
+        elif r < 0.45:
+            parts.append('\n')
+        elif r < 0.70:
+            parts.append(' ')
+    return ''.join(parts)
+
+
+def main():
+    system = EssayGradingSystem()
+    
+    print("=" * 60)
+    print("作文特徵擷取效能比較")
+    print("=" * 60)
+    print(f"{'字數':>10} {'舊版 (ms)':>12} {'新版 (ms)':>12} {'加速':>8}")
+    print("-" * 60)
+    
+    for n_words in [200, 2000, 20000, 200000]:
+        text = synthetic_essay(n_words)
+        assert system.analyze_essay(text) == legacy_analyze_essay(text)
+        
+        number = max(1, 200000 // n_words)
+        legacy = timeit.timeit(lambda: legacy_analyze_essay(text), number=number) / number
+        current = timeit.timeit(lambda: system.analyze_essay(text), number=number) / number
+        
+        print(f"{len(text):>10} {legacy * 1e3:>12.3f} {current * 1e3:>12.3f} {legacy / current:>7.2f}x")
+    
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""
+端到端批改流程效能基準測試
+
+離線產生合成的手寫風格作文頁面（CJK 文字、雜訊、傾斜、不同 DPI），
+分別量測各階段的延遲與吞吐量：
+preprocess_image、_deskew、icr_recognize、analyze_essay、score_essay、
+AnswerGrader.grade_answer / grade_cohort。
+結果存成 JSON，可與先前的結果比較，延遲變慢超過門檻時以結束碼 1 結束。
+
+執行方式：
+    python benchmarks/bench_pipeline.py                  # 全部階段（需 easyocr）
+    python benchmarks/bench_pipeline.py --skip-ocr       # 不載入 ICR 模型
+    python benchmarks/bench_pipeline.py --compare results/benchmarks/base.json
+
+有安裝 Pillow 且找得到中文字型（或以 --font 指定）時以字型繪製文字，
+否則以隨機筆畫模擬手寫字形（前處理、傾斜校正的負載相近，但 OCR 辨識不出文字）。
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'exam_calculation_grading', 'tools'))
+
+from essay_grading_system import EssayGradingSystem
+from grading_system import AnswerGrader
+from bench_features import synthetic_essay
+
+# 常見的中文字型位置（Linux / macOS / Windows）
+CJK_FONT_CANDIDATES = [
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/truetype/arphic/ukai.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    'C:/Windows/Fonts/msjh.ttc',
+]
+
+# A4 紙張大小（英吋）
+PAGE_SIZE_INCHES = (8.27, 11.69)
+
+
+def find_cjk_font(font_path=None):
+    """找出可用的中文字型；沒有 Pillow 或找不到字型時返回 None"""
+    try:
+        import PIL  # noqa: F401
+    except ImportError:
+        return None
+    
+    for path in [font_path] + CJK_FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def synthetic_page(text, dpi=300, skew=2.0, noise=12.0, font_path=None, seed=0):
+    """
+    產生一頁合成的手寫風格作文（BGR 圖片陣列）
+    
+    文字依稿紙格線排列，每個字的位置與大小略有抖動；
+    最後加上高斯雜訊並旋轉 skew 度模擬掃描傾斜。
+    """
+    rng = np.random.default_rng(seed)
+    width, height = int(PAGE_SIZE_INCHES[0] * dpi), int(PAGE_SIZE_INCHES[1] * dpi)
+    cell = max(8, int(0.3 * dpi))
+    margin = int(0.6 * dpi)
+    columns = (width - 2 * margin) // cell
+    rows = (height - 2 * margin) // cell
+    
+    positions = []
+    row, column = 0, 0
+    for char in text:
+        if char == '\n':
+            row, column = row + 1, 0
+            continue
+        if column >= columns:
+            row, column = row + 1, 0
+        if row >= rows:
+            break
+        jitter = rng.integers(-cell // 10, cell // 10 + 1, size=2)
+        positions.append((char, margin + column * cell + jitter[0], margin + row * cell + jitter[1]))
+        column += 1
+    
+    if font_path:
+        from PIL import Image, ImageDraw, ImageFont
+        
+        page = Image.new('L', (width, height), 255)
+        draw = ImageDraw.Draw(page)
+        font = ImageFont.truetype(font_path, int(cell * 0.8))
+        for char, x, y in positions:
+            draw.text((int(x), int(y)), char, fill=int(rng.integers(0, 60)), font=font)
+        gray = np.array(page)
+    else:
+        gray = np.full((height, width), 255, dtype=np.uint8)
+        thickness = max(1, dpi // 120)
+        for char, x, y in positions:
+            if char.isspace():
+                continue
+            # 以 2~6 筆隨機筆畫模擬一個字
+            for _ in range(int(rng.integers(2, 7))):
+                points = rng.integers(cell // 10, cell * 9 // 10, size=(3, 2)) + (x, y)
+                cv2.polylines(gray, [points.astype(np.int32)], False, int(rng.integers(0, 60)), thickness)
+    
+    # 雜訊與傾斜
+    noisy = gray.astype(np.float32) + rng.normal(0, noise, gray.shape).astype(np.float32)
+    gray = np.clip(noisy, 0, 255).astype(np.uint8)
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), skew, 1.0)
+    gray = cv2.warpAffine(gray, matrix, (width, height), borderValue=255)
+    
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+
+
+def measure(fn, repeat, number=1, warmup=1):
+    """
+    量測 fn 的單次耗時（秒），共取 repeat 個樣本
+    
+    每個樣本連續執行 number 次後取平均（同 timeit），
+    讓微秒等級的階段不受計時器解析度與單次抖動影響。
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return timings
+
+
+def summarize(timings, items_per_call=1):
+    """延遲統計（毫秒）與吞吐量（每秒處理數）"""
+    timings = np.asarray(timings)
+    return {
+        'count': int(len(timings)),
+        'mean_ms': float(timings.mean() * 1e3),
+        'p50_ms': float(np.percentile(timings, 50) * 1e3),
+        'p95_ms': float(np.percentile(timings, 95) * 1e3),
+        'min_ms': float(timings.min() * 1e3),
+        'max_ms': float(timings.max() * 1e3),
+        'throughput_per_s': float(items_per_call * len(timings) / timings.sum())
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_images(system, args, font_path, stages):
+    """影像相關階段：preprocess_image、_deskew、icr_recognize（依 DPI 分別量測）"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for dpi in args.dpi:
+            page_paths = []
+            for i in range(args.pages):
+                text = synthetic_essay(400, seed=i)
+                page = synthetic_page(text, dpi=dpi, skew=random.Random(i).uniform(-3, 3),
+                                      font_path=font_path, seed=i)
+                path = os.path.join(tmp, f'page_{dpi}_{i}.png')
+                cv2.imwrite(path, page)
+                page_paths.append(path)
+            
+            paths = itertools.cycle(page_paths)
+            timings = measure(lambda: system.preprocess_image(next(paths)), args.repeat)
+            stages[f'preprocess_image[dpi={dpi}]'] = summarize(timings)
+            
+            # 傾斜校正的輸入為二值化後的頁面
+            binaries = []
+            for path in page_paths:
+                gray = cv2.cvtColor(cv2.imread(path), cv2.COLOR_BGR2GRAY)
+                binaries.append(cv2.adaptiveThreshold(
+                    gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+                ))
+            binaries = itertools.cycle(binaries)
+            timings = measure(lambda: EssayGradingSystem._deskew(next(binaries)), args.repeat)
+            stages[f'deskew[dpi={dpi}]'] = summarize(timings)
+            
+            if not args.skip_ocr:
+                timings = measure(lambda: system.icr_recognize(next(paths)), args.ocr_repeat)
+                stages[f'icr_recognize[dpi={dpi}]'] = summarize(timings)
+            
+            print(f"  ✓ {dpi} DPI（{len(page_paths)} 頁）")
+
+
+def bench_text(system, args, stages):
+    """文字相關階段：analyze_essay、score_essay"""
+    for n_words in args.essay_words:
+        essays = [synthetic_essay(n_words, seed=i) for i in range(args.pages)]
+        samples = itertools.cycle([(text, system.analyze_essay(text)) for text in essays])
+        
+        texts = itertools.cycle(essays)
+        timings = measure(lambda: system.analyze_essay(next(texts)), args.repeat, number=100)
+        stages[f'analyze_essay[words={n_words}]'] = summarize(timings)
+        
+        timings = measure(lambda: system.score_essay(*next(samples)), args.repeat, number=1000)
+        stages[f'score_essay[words={n_words}]'] = summarize(timings)
+
+
+def bench_answer_grader(args, stages):
+    """計算題評分：grade_answer（逐一）與 grade_cohort（整批）"""
+    grader = AnswerGrader()
+    standard = {
+        '輸出電流_大小': 114.36275,
+        '輸出電流_相角': 10.5,
+        '輸出實功率': 89591.987,
+        '輸出虛功率': 16604.893,
+        '轉速': 900.0,
+        '電磁轉矩': 950.601,
+    }
+    grader.set_standard_answer(standard)
+    for item in standard:
+        grader.add_criterion(item, max_score=4.0, tolerance=0.02)
+    
+    rng = random.Random(0)
+    answers = [
+        {item: value * (1 + rng.uniform(-0.3, 0.3)) for item, value in standard.items() if rng.random() < 0.9}
+        for _ in range(args.cohort_size)
+    ]
+    cycle = itertools.cycle(answers)
+    
+    timings = measure(lambda: grader.grade_answer(next(cycle), has_diagram=True), args.repeat, number=1000)
+    stages['grade_answer'] = summarize(timings)
+    
+    matrix = grader.build_answer_matrix(answers)
+    timings = measure(lambda: grader.grade_cohort(matrix, has_diagram=True), args.repeat)
+    stages[f'grade_cohort[students={args.cohort_size}]'] = summarize(timings, items_per_call=args.cohort_size)
+
+
+def compare(current, baseline, threshold):
+    """比較兩次結果的 p50 延遲，返回變慢超過門檻的階段"""
+    print("\n" + "=" * 72)
+    print(f"與基準比較（p50，變慢超過 {threshold * 100:.0f}% 視為退步）")
+    print("=" * 72)
+    print(f"{'階段':<36} {'基準 (ms)':>10} {'本次 (ms)':>10} {'比值':>8}")
+    print("-" * 72)
+    
+    regressions = []
+    for name, stats in current['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            print(f"{name:<36} {'-':>10} {stats['p50_ms']:>10.3f} {'新增':>8}")
+            continue
+        ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] > 0 else float('inf')
+        flag = ' ⚠️' if ratio > 1 + threshold else ''
+        print(f"{name:<36} {base['p50_ms']:>10.3f} {stats['p50_ms']:>10.3f} {ratio:>7.2f}x{flag}")
+        if flag:
+            regressions.append(name)
+    
+    print("=" * 72)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端批改流程效能基準測試')
+    parser.add_argument('--dpi', type=int, nargs='+', default=[150, 300], help='合成頁面的解析度')
+    parser.add_argument('--pages', type=int, default=4, help='每種解析度產生的頁數')
+    parser.add_argument('--repeat', type=int, default=10, help='各階段的量測樣本數')
+    parser.add_argument('--ocr-repeat', type=int, default=3, help='icr_recognize 的量測次數')
+    parser.add_argument('--essay-words', type=int, nargs='+', default=[400, 4000], help='合成作文的詞數')
+    parser.add_argument('--cohort-size', type=int, default=10000, help='grade_cohort 的考生數')
+    parser.add_argument('--skip-ocr', action='store_true', help='不量測 icr_recognize（不載入 ICR 模型）')
+    parser.add_argument('--cpu', action='store_true', help='ICR 不使用 GPU')
+    parser.add_argument('--cpu-threads', type=int, help='PyTorch / OpenCV 執行緒數')
+    parser.add_argument('--no-quantize', action='store_true', help='CPU 模式下停用 EasyOCR 預設的 int8 量化')
+    parser.add_argument('--font', help='繪製合成頁面的中文字型檔')
+    parser.add_argument('--output', help='結果 JSON 路徑（預設 results/benchmarks/bench_<時間>.json）')
+    parser.add_argument('--compare', help='作為基準的先前結果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.2, help='p50 變慢超過此比例視為退步')
+    args = parser.parse_args()
+    
+    font_path = find_cjk_font(args.font)
+    system = EssayGradingSystem(gpu=not args.cpu, quantize=not args.no_quantize, cpu_threads=args.cpu_threads)
+    
+    print("=" * 72)
+    print("端到端批改流程效能基準測試")
+    print("=" * 72)
+    print(f"合成頁面：{'字型 ' + font_path if font_path else '隨機筆畫（未找到中文字型）'}")
+    
+    if not args.skip_ocr:
+        print("載入 ICR 模型（不計入量測）...")
+        system.reader
+    
+    stages = {}
+    print("\n量測影像階段...")
+    bench_images(system, args, font_path, stages)
+    print("量測文字階段...")
+    bench_text(system, args, stages)
+    print("量測計算題評分...")
+    bench_answer_grader(args, stages)
+    
+    result = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'opencv': cv2.__version__,
+            'synthetic_font': font_path,
+            'args': vars(args)
+        },
+        'stages': stages
+    }
+    
+    print("\n" + "=" * 72)
+    print(f"{'階段':<36} {'p50 (ms)':>10} {'p95 (ms)':>10} {'每秒':>12}")
+    print("-" * 72)
+    for name, stats in stages.items():
+        print(f"{name:<36} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} {stats['throughput_per_s']:>12.1f}")
+    print("=" * 72)
+    
+    output = args.output or os.path.join(
+        'results', 'benchmarks', f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 結果已儲存至：{output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} 個階段變慢：{', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
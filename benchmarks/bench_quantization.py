@@ -0,0 +1,188 @@
+"""
+CPU 模式 int8 量化的準確度與速度比較
+
+以同一組參考頁面分別用 float32 與動態 int8 量化的辨識器（CPU 模式）辨識，
+報告字元錯誤率（CER）、量化前後輸出的差異與每頁延遲。
+int8 的 CER 比 float32 高出超過 --max-cer-delta 時以結束碼 1 結束。
+
+參考頁面：
+- --images 與 --references：實際掃描頁面與正確文字（JSON：{圖片路徑: 文字}）；
+  未提供 --references 時只比較量化前後的輸出差異與速度
+- 未指定 --images 時以中文字型產生合成頁面（需 Pillow 與中文字型），正確文字即為繪製的文字
+
+執行方式：
+    python benchmarks/bench_quantization.py --threads 4
+    python benchmarks/bench_quantization.py --images scans/*.png --references scans/references.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from essay_grading_system import EssayGradingSystem
+from bench_features import synthetic_essay
+from bench_pipeline import find_cjk_font, git_commit, summarize, synthetic_page
+
+
+def normalize(text):
+    """比較時忽略空白與換行"""
+    return ''.join(text.split())
+
+
+def edit_distance(a, b):
+    """字元層級的 Levenshtein 距離"""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        previous = current
+    return previous[-1]
+
+
+def error_rate(hypotheses, references):
+    """整體字元錯誤率：總編輯距離 / 參考文字總字數"""
+    distance = sum(edit_distance(normalize(h), normalize(r)) for h, r in zip(hypotheses, references))
+    length = sum(len(normalize(r)) for r in references)
+    return distance / length if length else 0.0
+
+
+def synthetic_reference_set(tmp, pages, dpi, font_path):
+    """產生合成參考頁面，返回 (圖片路徑, 正確文字)"""
+    image_paths, references = [], []
+    for i in range(pages):
+        # 約 120 詞，一頁排得下，繪製的文字即為完整的正確文字
+        text = synthetic_essay(120, seed=i)
+        path = os.path.join(tmp, f'reference_{i}.png')
+        cv2.imwrite(path, synthetic_page(text, dpi=dpi, skew=0.0, font_path=font_path, seed=i))
+        image_paths.append(path)
+        references.append(text)
+    return image_paths, references
+
+
+def recognize_all(system, image_paths):
+    """依序辨識所有頁面（第一頁先辨識一次暖機，不計時），返回 (文字, 每頁耗時, 平均信心度)"""
+    system.icr_recognize(image_paths[0])
+    
+    texts, timings, confidences = [], [], []
+    for path in image_paths:
+        start = time.perf_counter()
+        icr_result = system.icr_recognize(path)
+        timings.append(time.perf_counter() - start)
+        texts.append(icr_result['text'])
+        confidences.append(float(icr_result['confidence']))
+    return texts, timings, float(np.mean(confidences))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU 模式 int8 量化的準確度與速度比較')
+    parser.add_argument('--images', nargs='+', help='參考頁面（預設產生合成頁面）')
+    parser.add_argument('--references', help='正確文字 JSON：{圖片路徑: 文字}')
+    parser.add_argument('--pages', type=int, default=8, help='合成參考頁面數')
+    parser.add_argument('--dpi', type=int, default=300, help='合成參考頁面的解析度')
+    parser.add_argument('--font', help='繪製合成頁面的中文字型檔')
+    parser.add_argument('--languages', nargs='+', default=['ch_sim', 'en'])
+    parser.add_argument('--threads', type=int, help='PyTorch / OpenCV 執行緒數')
+    parser.add_argument('--max-cer-delta', type=float, default=0.01, help='int8 的 CER 最多可比 float32 高出多少')
+    parser.add_argument('--output', help='結果 JSON 路徑（預設 results/benchmarks/quantization_<時間>.json）')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.images:
+            image_paths = args.images
+            references = None
+            if args.references:
+                with open(args.references, 'r', encoding='utf-8') as f:
+                    reference_map = json.load(f)
+                references = [reference_map[path] for path in image_paths]
+        else:
+            font_path = find_cjk_font(args.font)
+            if font_path is None:
+                parser.error('找不到中文字型（或未安裝 Pillow），請以 --font 指定，或以 --images 提供參考頁面')
+            image_paths, references = synthetic_reference_set(tmp, args.pages, args.dpi, font_path)
+        
+        print("=" * 72)
+        print(f"CPU 模式 int8 量化比較（{len(image_paths)} 頁，執行緒數：{args.threads or '預設'}）")
+        print("=" * 72)
+        
+        variants = {}
+        outputs = {}
+        for name, quantize in (('float32', False), ('int8', True)):
+            system = EssayGradingSystem(
+                languages=args.languages,
+                gpu=False,
+                quantize=quantize,
+                cpu_threads=args.threads
+            )
+            texts, timings, confidence = recognize_all(system, image_paths)
+            outputs[name] = texts
+            variants[name] = dict(summarize(timings), confidence=confidence)
+            if references is not None:
+                variants[name]['cer'] = error_rate(texts, references)
+            print(f"  ✓ {name}：p50 {variants[name]['p50_ms']:.0f} ms/頁")
+    
+    delta = {
+        # 以 float32 的輸出為參考，int8 與其不同的比例
+        'output_difference': error_rate(outputs['int8'], outputs['float32']),
+        'speedup': variants['float32']['mean_ms'] / variants['int8']['mean_ms']
+    }
+    if references is not None:
+        delta['cer'] = variants['int8']['cer'] - variants['float32']['cer']
+    
+    result = {
+        'metadata': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args)
+        },
+        'variants': variants,
+        'delta': delta
+    }
+    
+    print("\n" + "=" * 72)
+    print(f"{'':<10} {'CER':>8} {'信心度':>8} {'p50 (ms)':>10} {'每秒頁數':>10}")
+    print("-" * 72)
+    for name, stats in variants.items():
+        cer = f"{stats['cer']:.2%}" if 'cer' in stats else '-'
+        print(f"{name:<10} {cer:>8} {stats['confidence']:>8.2%} {stats['p50_ms']:>10.0f} {stats['throughput_per_s']:>10.2f}")
+    print("-" * 72)
+    if 'cer' in delta:
+        print(f"CER 差異（int8 - float32）：{delta['cer']:+.2%}")
+    print(f"輸出差異（int8 相對 float32）：{delta['output_difference']:.2%}")
+    print(f"加速：{delta['speedup']:.2f}x")
+    print("=" * 72)
+    
+    output = args.output or os.path.join(
+        'results', 'benchmarks', f"quantization_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n💾 結果已儲存至：{output}")
+    
+    if 'cer' in delta and delta['cer'] > args.max_cer_delta:
+        print(f"\n❌ int8 的 CER 比 float32 高出 {delta['cer']:.2%}（上限 {args.max_cer_delta:.2%}）")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,573 @@
 """
 AI 作文自動批改系統
 包含 ICR 辨識、評分、評估指標計算
+
+注意：OpenCV、EasyOCR、NumPy、matplotlib 等較重的套件
+只在實際用到的功能（辨識、指標計算、繪圖）中才載入，
+只對既有文字評分（analyze_essay / score_essay）時不需載入。
 """
 
-import cv2
-import numpy as np
-from PIL import Image
-import easyocr
-from typing import Dict, List, Tuple
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional, Tuple, Union
 import re
-from sklearn.metrics import confusion_matrix, classification_report
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
+import os
+import json
+import gc
+import contextlib
+import copy
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+if TYPE_CHECKING:
+    import easyocr
+    import numpy as np
+    
+    from answer_sheet_templates import AnswerSheetRegistry
+    from essay_profiler import EssayProfiler
+
+# 前處理參數（同時作為 OCR 快取鍵的一部分）
+DEFAULT_PREPROCESS_PARAMS = {
+    'blur_ksize': 5,        # 高斯模糊核大小
+    'block_size': 11,       # 自適應二值化區塊大小
+    'threshold_c': 2,       # 自適應二值化常數
+    'deskew_max_side': 1000,  # 估計傾斜角度時縮圖的最長邊（像素）
+    'deskew_min_angle': 0.5,  # 小於此角度（度）時不旋轉
+    'target_char_height': 40,  # 縮放後的目標字高（像素，0 表示不縮放）
+    'min_scale': 0.25,        # 縮放倍率下限
+    'max_scale': 1.0,         # 縮放倍率上限（預設不放大）
+    'scale_steps': 4,         # 倍率取 2^(-k/scale_steps) 的級距，相近的頁面縮放後尺寸相同
+    'scale_probe_side': 1000,  # 估計字高時縮圖的最長邊（像素）
+}
+
+# 送 OCR 前的頁面分流參數（皆在縮圖上計算）
+DEFAULT_TRIAGE_PARAMS = {
+    'thumbnail_side': 1024,       # 縮圖的最長邊（像素）
+    'ink_block_size': 31,         # 偵測墨跡的自適應二值化區塊大小
+    'ink_threshold_c': 15,        # 比周圍背景暗多少灰階才算墨跡
+    'blank_ink_ratio': 0.0005,    # 墨跡比例低於此值視為空白頁
+    'min_contrast': 20,           # 墨跡與背景的灰階差低於此值視為對比過低
+    'min_sharpness': 0.02,        # 筆畫周圍的 Laplacian 變異數 / 對比²，低於此值視為模糊
+    'duplicate_max_distance': 10, # 感知雜湊的漢明距離不超過此值者才進一步比對縮圖
+    'duplicate_max_diff': 12,     # 64×64 縮圖各像素灰階差皆不超過此值時視為重複上傳
+}
+
+# 文法評分計入的標點符號
+PUNCTUATION_MARKS = '，。！？、；：'
+
+# 句子：從第一個非空白、非句末標點的字元開始，到下一個句末標點為止
+_SENTENCE_PATTERN = re.compile(r'[^\s。！？.!?][^。！？.!?]*')
+
+# 段落：含有非空白字元的一行
+_PARAGRAPH_PATTERN = re.compile(r'\S[^\n]*')
+
+# 句末標點
+_SENTENCE_END_PATTERN = re.compile(r'[。！？.!?]')
+
+# 等級（由高到低），評估時的標籤順序
+GRADE_LABELS = ['A+', 'A', 'B', 'C', 'D', 'F']
+
+# 批改流程的各階段（結果中 'timings' 的鍵，單位為秒）
+# cache 為 OCR 快取命中時讀取快取的時間，取代 load ~ recognition；template 為對齊答案卷範本的時間
+STAGES = ('load', 'triage', 'preprocess', 'deskew', 'template', 'detection', 'recognition', 'cache', 'analysis', 'scoring')
+
+# 各階段耗時直方圖的分界（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 計數器（名稱: 說明）
+METRIC_COUNTERS = {
+    'essays_graded': '完成評分的作文數',
+    'essays_failed': '無法處理的作文數',
+    'pages_recognized': '送入 ICR 模型辨識的頁數',
+    'ocr_cache_hits': '使用快取辨識結果的頁數',
+    'template_pages': '對齊答案卷範本而略過文字偵測的頁數',
+}
+
+# 分段給分表：(分段點, 各段分數)，供 score_batch 以 np.digitize 查表
+# 須與 _score_content / _score_structure / _score_vocabulary 的門檻一致
+SCORE_BANDS = {
+    'content_char_count': ([200, 400, 600, 800], [3, 6, 9, 12, 15]),
+    'content_paragraph_count': ([3, 4, 5], [4, 6, 8, 10]),
+    'content_vocabulary_richness': ([0.4, 0.5, 0.6], [4, 6, 8, 10]),
+    'structure_sentence_count': ([5, 10, 15], [4, 6, 8, 10]),
+    'vocabulary_vocabulary_richness': ([0.3, 0.4, 0.5, 0.6], [2, 4, 6, 8, 10]),
+    'vocabulary_word_count': ([200, 300, 500], [2, 3, 4, 5]),
+}
+
+
+class OCRResultCache:
+    """
+    以內容定址的 OCR 結果磁碟快取
+    
+    快取鍵為「圖片位元組 + 前處理參數 + 辨識語言」的 SHA-256，
+    每筆結果存成一個 JSON 檔；總大小超過上限時，依最近使用時間（LRU）淘汰。
+    """
+    
+    def __init__(self, cache_dir: str = 'results/ocr_cache',
+                 max_bytes: int = 512 * 1024 * 1024):
+        """
+        cache_dir: 快取資料夾
+        max_bytes: 快取總大小上限（位元組）
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._scan())
+    
+    @staticmethod
+    def make_key(image_bytes: bytes, params: Dict, languages: List[str]) -> str:
+        """計算快取鍵"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+        digest.update(json.dumps(list(languages)).encode('utf-8'))
+        return digest.hexdigest()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """讀取快取；命中時更新存取時間"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        
+        os.utime(path)
+        self.hits += 1
+        return result
+    
+    def put(self, key: str, result: Dict):
+        """寫入快取，必要時淘汰最久未使用的項目"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        
+        data = json.dumps(result, ensure_ascii=False, default=_to_json).encode('utf-8')
+        old_size = os.path.getsize(path) if os.path.exists(path) else 0
+        
+        # 先寫入暫存檔再替換，避免中斷時留下不完整的檔案
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        self._total_bytes += len(data) - old_size
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+    
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """列出所有快取檔案：(存取時間, 路徑, 大小)"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+    
+    def _evict(self):
+        """淘汰最久未使用的項目，直到總大小低於上限的 90%"""
+        entries = sorted(self._scan())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+        
+        self._total_bytes = total
+    
+    def stats(self) -> Dict:
+        """快取統計"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0,
+            'bytes': self._total_bytes,
+            'max_bytes': self.max_bytes
+        }
+
+
+class UnreadablePageError(ValueError):
+    """頁面分流判定無法辨識（需重新掃描）；triage 為分流報告（對比、清晰度與原因）"""
+    
+    def __init__(self, message: str, image_path: str, triage: Dict):
+        super().__init__(message)
+        self.image_path = image_path
+        self.triage = triage
+
+
+class PageTriage:
+    """
+    送 OCR 前的頁面分流
+    
+    讀圖後先在縮圖上計算墨跡比例、對比、清晰度（Laplacian 變異數）與感知雜湊（dHash）：
+    - 空白頁：不辨識，返回無內容的結果（評分為 0）
+    - 無法辨識（對比過低或模糊）：不辨識，返回錯誤並註明需重新掃描
+      （icr_recognize 拋出帶有分流報告的 UnreadablePageError）
+    - 重複上傳（與先前辨識過的其他頁面雜湊相近且縮圖幾乎一致）：沿用先前的辨識結果
+    判斷結果與原因記錄在辨識結果的 'triage'。
+    同一路徑重新批改不算重複上傳（由 OCR 快取命中，或未啟用快取時重新辨識）。
+    OCR 快取命中的頁面同樣會分流，並記錄供之後比對重複上傳；分流掉的頁面不存入快取。
+    
+    重複比對只涵蓋已辨識完成的頁面，同一批次內互相重複的頁面仍會各自辨識。
+    """
+    
+    def __init__(self, params: Optional[Dict] = None, max_entries: int = 1000):
+        """
+        params: 分流參數（預設為 DEFAULT_TRIAGE_PARAMS）
+        max_entries: 保留供重複比對的頁面數上限（每頁保留完整辨識結果，超過時淘汰最舊的）
+        """
+        self.params = dict(DEFAULT_TRIAGE_PARAMS, **(params or {}))
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # 依辨識順序保存：序號 -> (dHash, 頁面名稱, 縮圖特徵, 辨識結果)
+        self._seen: OrderedDict = OrderedDict()
+        self._next_id = 0
+    
+    def find_duplicate(self, report: Dict, signature: np.ndarray,
+                       exclude: Optional[str] = None) -> Optional[Tuple[str, Dict]]:
+        """
+        找出與此頁相同的已辨識頁面，返回 (頁面名稱, 辨識結果)；沒有時返回 None
+        
+        exclude: 略過此名稱的頁面（同一路徑先前的辨識結果不算重複上傳）
+        """
+        import numpy as np
+        
+        dhash = int(report['dhash'], 16)
+        with self._lock:
+            # 由最近辨識的頁面往前找
+            for seen_hash, label, seen_signature, icr_result in reversed(self._seen.values()):
+                if label == exclude:
+                    continue
+                if bin(dhash ^ seen_hash).count('1') > self.params['duplicate_max_distance']:
+                    continue
+                diff = np.abs(seen_signature.astype(np.int16) - signature).max()
+                if diff <= self.params['duplicate_max_diff']:
+                    return label, icr_result
+        return None
+    
+    def remember(self, report: Dict, signature: np.ndarray, label: str, icr_result: Dict):
+        """記錄已辨識的頁面，供之後比對重複上傳"""
+        with self._lock:
+            self._seen[self._next_id] = (int(report['dhash'], 16), label, signature, icr_result)
+            self._next_id += 1
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+
+
+class EssayFeatureAccumulator:
+    """
+    增量式作文特徵累加器
+    
+    ICR 每辨識出一個文字區塊就呼叫 add_region，累加字數、句子數、
+    不重複詞彙等統計；最後一個區塊辨識完成時即可取得特徵與暫定分數，
+    不需再對全文重新分析。
+    
+    各區塊以空白相接並壓縮連續空白（同 _post_process_text），
+    因此 features() 與對合併後全文呼叫 analyze_essay 的結果相同。
+    """
+    
+    def __init__(self):
+        self.region_count = 0
+        self.confidence_sum = 0.0
+        self._token_count = 0
+        self._token_chars = 0
+        self._unique_tokens = set()
+        self._sentence_count = 0
+        self._in_sentence = False
+        self._punctuation_count = 0
+    
+    def add_region(self, bbox, text: str, confidence: float):
+        """加入一個辨識區塊 (bbox, 文字, 信心度)"""
+        self.region_count += 1
+        self.confidence_sum += confidence
+        self.feed(text)
+    
+    def feed(self, text: str):
+        """加入一段文字（與先前內容以空白相接）"""
+        for token in text.split():
+            self._token_count += 1
+            self._token_chars += len(token)
+            self._unique_tokens.add(token)
+            self._punctuation_count += sum(token.count(p) for p in PUNCTUATION_MARKS)
+            
+            # 句子可能跨越多個詞與區塊：記錄目前句子是否已有內容
+            pieces = _SENTENCE_END_PATTERN.split(token)
+            if pieces[0] and not self._in_sentence:
+                self._sentence_count += 1
+                self._in_sentence = True
+            for piece in pieces[1:]:
+                self._in_sentence = bool(piece)
+                if piece:
+                    self._sentence_count += 1
+    
+    @property
+    def confidence(self) -> float:
+        """目前的平均信心度"""
+        return self.confidence_sum / self.region_count if self.region_count else 0
+    
+    def features(self) -> Dict:
+        """目前的作文特徵（格式同 analyze_essay）"""
+        word_count = self._token_count
+        char_count = self._token_chars + max(word_count - 1, 0)
+        sentence_count = self._sentence_count
+        
+        return {
+            'char_count': char_count,
+            'word_count': word_count,
+            'sentence_count': sentence_count,
+            # 空白已壓縮，不含換行，有內容即為一段
+            'paragraph_count': 1 if word_count else 0,
+            'vocabulary_richness': len(self._unique_tokens) / word_count if word_count else 0,
+            'avg_sentence_length': char_count / sentence_count if sentence_count > 0 else 0,
+            'punctuation_count': self._punctuation_count
+        }
+
+
+class GradingMetrics:
+    """
+    批改流程的效能統計
+    
+    各階段耗時以累積直方圖記錄（分界見 LATENCY_BUCKETS），另有批改篇數等計數器，
+    可用 to_prometheus() 匯出為 Prometheus 文字格式。可在多個執行緒間共用。
+    """
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # 階段 -> 各分界的次數（最後一格為超過最大分界者），與耗時總和
+        self._bucket_counts: Dict[str, List[int]] = {}
+        self._sums: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in METRIC_COUNTERS}
+    
+    def observe(self, stage: str, seconds: float):
+        """記錄一次階段耗時（秒）"""
+        import bisect
+        
+        with self._lock:
+            counts = self._bucket_counts.get(stage)
+            if counts is None:
+                counts = self._bucket_counts[stage] = [0] * (len(self.buckets) + 1)
+                self._sums[stage] = 0.0
+            counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self._sums[stage] += seconds
+    
+    def observe_timings(self, timings: Dict[str, float]):
+        """記錄一篇作文的各階段耗時"""
+        for stage, seconds in timings.items():
+            self.observe(stage, seconds)
+    
+    def inc(self, name: str, value: int = 1):
+        """計數器加 value"""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+    
+    def snapshot(self) -> Dict:
+        """
+        目前的統計
+        
+        返回：{'stages': {階段: {'count', 'sum', 'mean', 'buckets': {分界: 累積次數}}}, 'counters': {...}}
+        """
+        with self._lock:
+            stages = {}
+            for stage, counts in self._bucket_counts.items():
+                cumulative, running = {}, 0
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    running += count
+                    cumulative[bound] = running
+                stages[stage] = {
+                    'count': running,
+                    'sum': self._sums[stage],
+                    'mean': self._sums[stage] / running if running else 0.0,
+                    'buckets': cumulative
+                }
+            return {'stages': stages, 'counters': dict(self.counters)}
+    
+    def to_prometheus(self, prefix: str = 'essay_grading') -> str:
+        """匯出為 Prometheus 文字格式（text/plain; version=0.0.4）"""
+        snapshot = self.snapshot()
+        lines = [
+            f"# HELP {prefix}_stage_seconds 各階段耗時（秒）",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        for stage in STAGES + tuple(s for s in snapshot['stages'] if s not in STAGES):
+            stats = snapshot['stages'].get(stage)
+            if stats is None:
+                continue
+            for bound, count in stats['buckets'].items():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        
+        for name, value in snapshot['counters'].items():
+            lines.append(f"# HELP {prefix}_{name}_total {METRIC_COUNTERS.get(name, name)}")
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        
+        return '\n'.join(lines) + '\n'
+
+
+def _to_json(value):
+    """將 numpy 型別轉為可 JSON 序列化的 Python 型別"""
+    # np.ndarray 與 numpy 純量皆提供 tolist()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"無法序列化的型別：{type(value).__name__}")
+
+
+# 行程內共用的 ICR 模型（依語言與裝置區分）
+_READERS: Dict[Tuple, 'easyocr.Reader'] = {}
+_READERS_LOCK = threading.Lock()
+
+
+def get_reader(languages: List[str] = ('ch_sim', 'en'), gpu: bool = True,
+               quantize: bool = True, verbose: bool = False) -> 'easyocr.Reader':
+    """
+    取得共用的 ICR 模型
+    
+    同一行程內相同設定的模型只載入一次，由所有 EssayGradingSystem 共用
+    
+    quantize: EasyOCR 的 quantize 選項（EasyOCR 預設即為 True）：在 CPU 上執行時以 torch 動態 int8 量化模型，
+              實際被量化的是辨識器的 LSTM 與全連接層（偵測器 CRAFT 為卷積網路，不受影響）；
+              False 時使用 float32 模型
+    verbose: 是否列印模型載入訊息
+    """
+    import easyocr
+    
+    key = (tuple(languages), gpu, quantize)
+    with _READERS_LOCK:
+        if key not in _READERS:
+            if verbose:
+                print("正在載入 ICR 模型...")
+            _READERS[key] = easyocr.Reader(list(languages), gpu=gpu, quantize=quantize, verbose=verbose)
+            if verbose:
+                print("✓ ICR 模型載入完成")
+        return _READERS[key]
+
+
+def preload_reader(languages: List[str] = ('ch_sim', 'en'), gpu: bool = True,
+                   quantize: bool = True, verbose: bool = False) -> 'easyocr.Reader':
+    """
+    預先載入 ICR 模型
+    
+    在建立子行程（fork）之前呼叫，子行程即可透過 copy-on-write
+    共用父行程已載入的模型權重，不必各自重新載入。
+    """
+    reader = get_reader(languages, gpu, quantize, verbose)
+    
+    # 將目前所有物件移出 GC 追蹤範圍，避免子行程的垃圾回收寫入
+    # 物件標頭而觸發記憶體分頁複製
+    gc.freeze()
+    
+    return reader
+
+
+def set_cpu_threads(threads: int):
+    """
+    設定本行程 PyTorch 與 OpenCV 使用的執行緒數
+    
+    兩者預設都會使用所有核心；同一台機器執行多個批改行程時彼此搶用 CPU，
+    反而更慢，應設為「核心數 / 行程數」。
+    """
+    import cv2
+    
+    cv2.setNumThreads(threads)
+    try:
+        import torch
+    except ImportError:
+        # 只做前處理或評分的行程不需要 PyTorch
+        return
+    
+    torch.set_num_threads(threads)
+    try:
+        # 運算子之間不另外平行；已執行過平行運算後不能再變更
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def _init_preprocess_worker(threads: int):
+    """前處理子行程的初始化：只限制 OpenCV 執行緒數（子行程不使用模型，不載入 PyTorch）"""
+    import cv2
+    
+    cv2.setNumThreads(threads)
+
 
 class EssayGradingSystem:
     """AI 作文批改系統"""
     
-    def __init__(self, languages=['ch_sim', 'en']):
+    def __init__(self, languages=['ch_sim', 'en'],
+                 ocr_cache: Optional[OCRResultCache] = None,
+                 gpu: bool = True,
+                 quantize: bool = True,
+                 cpu_threads: Optional[int] = None,
+                 verbose: bool = False,
+                 metrics: Optional[GradingMetrics] = None,
+                 profiler: Optional['EssayProfiler'] = None,
+                 templates: Optional['AnswerSheetRegistry'] = None,
+                 triage: Optional[PageTriage] = None):
         """
         初始化系統
         languages: 支援的語言列表
+        ocr_cache: OCR 結果快取（None 表示不使用快取）
+        gpu: 是否使用 GPU 執行 ICR 模型（False 為 CPU 模式）
+        quantize: CPU 模式下是否以動態 int8 量化執行辨識器（EasyOCR 的預設；見 get_reader，GPU 模式不適用）
+        cpu_threads: 本行程的 PyTorch 與 OpenCV 執行緒數（見 set_cpu_threads，None 表示不限制）；
+                     前處理子行程只限制 OpenCV（子行程不載入 PyTorch）
+        verbose: 是否列印辨識進度與評分結果
+        metrics: 各階段耗時與計數的統計（None 表示建立新的統計）
+        profiler: 逐篇效能剖析器（essay_profiler.EssayProfiler，None 表示不剖析）
+        templates: 答案卷範本（answer_sheet_templates.AnswerSheetRegistry）；
+                   對得上範本的頁面直接辨識作答區，略過文字偵測
+        triage: 送 OCR 前的頁面分流（空白、無法辨識、重複上傳；None 表示不分流）
+        
+        ICR 模型在第一次辨識時才載入，只做評分的使用情境不需等待模型載入
         """
-        print("正在載入 ICR 模型...")
-        self.reader = easyocr.Reader(languages, gpu=True)
-        print("✓ ICR 模型載入完成")
+        self.languages = list(languages)
+        self.gpu = gpu
+        self.quantize = quantize
+        self.cpu_threads = cpu_threads
+        self.verbose = verbose
+        self._reader = None
+        
+        # 讀圖與前處理在載入模型之前就會執行，執行緒數須於此先行設定
+        if cpu_threads:
+            set_cpu_threads(cpu_threads)
+        
+        # 效能統計與剖析
+        self.metrics = metrics if metrics is not None else GradingMetrics()
+        self.profiler = profiler
+        
+        # 前處理參數
+        self.preprocess_params = dict(DEFAULT_PREPROCESS_PARAMS)
+        
+        # OCR 結果快取
+        self.ocr_cache = ocr_cache
+        
+        # 答案卷範本與頁面分流
+        self.templates = templates
+        self.triage = triage
         
         # 評分權重
         self.weights = {
@@ -44,6 +587,28 @@ class EssayGradingSystem:
             'F': 0
         }
     
+    @property
+    def reader(self) -> 'easyocr.Reader':
+        """ICR 模型（延遲載入，同行程內共用）"""
+        if self._reader is None:
+            self._reader = get_reader(self.languages, self.gpu, self.quantize, self.verbose)
+        return self._reader
+    
+    @reader.setter
+    def reader(self, reader: 'easyocr.Reader'):
+        self._reader = reader
+    
+    def _profile(self, image_path: Union[str, np.ndarray]):
+        """剖析一篇作文（未設定 profiler 時不做任何事）"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.profile(_image_label(image_path))
+    
+    def _log(self, *args):
+        """verbose 模式下列印進度訊息"""
+        if self.verbose:
+            print(*args)
+    
     def preprocess_image(self, image_path: str) -> np.ndarray:
         """
         前處理圖片
@@ -56,41 +621,130 @@ class EssayGradingSystem:
         5. 傾斜校正
         """
         # 讀取圖片
+        img = self._load_image(image_path)
+        
+        processed, _ = self._preprocess_array(img, self.preprocess_params)
+        return processed
+    
+    @staticmethod
+    def _load_image(image_path: Union[str, np.ndarray]) -> np.ndarray:
+        """讀取圖片；已是圖片陣列（例如 PDF 轉出的頁面）時直接返回"""
+        import cv2
+        
+        if not isinstance(image_path, str):
+            return image_path
+        
         img = cv2.imread(image_path)
         
         if img is None:
             raise ValueError(f"無法讀取圖片：{image_path}")
         
-        # 灰階轉換
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        return img
+    
+    @staticmethod
+    def _preprocess_array(img: np.ndarray, params: Optional[Dict] = None,
+                          timings: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        對已讀取的圖片進行灰階、縮放、去噪、二值化與傾斜校正
+        
+        先在縮圖上估計字高，將頁面縮小到目標字高（target_char_height）後再去噪與二值化，
+        去噪與二值化的區塊大小因此與字的大小相稱，也只需處理較少的像素。
+        
+        返回 (前處理後圖片, 前處理資訊)，資訊包含實際套用的旋轉角度、縮放倍率與估計字高
+        （辨識結果的 bbox 為縮放後的座標，除以 'scale' 即為原圖座標）
+        timings: 若提供，記錄 'preprocess'（灰階、縮放、去噪、二值化）與 'deskew' 的耗時
+        """
+        import cv2
+        
+        params = params or DEFAULT_PREPROCESS_PARAMS
+        start = time.perf_counter()
+        
+        # 灰階轉換（已是灰階的頁面則略過）
+        if img.ndim == 2:
+            gray = img
+        else:
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        
+        # 依估計字高縮放
+        char_height = None
+        scale = 1.0
+        if params['target_char_height']:
+            char_height = _estimate_char_height(gray, params['scale_probe_side'])
+            scale = _choose_scale(char_height, params)
+            if scale != 1.0:
+                gray = cv2.resize(
+                    gray, None, fx=scale, fy=scale,
+                    interpolation=cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+                )
         
         # 去噪（高斯模糊）
-        denoised = cv2.GaussianBlur(gray, (5, 5), 0)
+        ksize = params['blur_ksize']
+        denoised = cv2.GaussianBlur(gray, (ksize, ksize), 0)
         
         # 自適應二值化
         binary = cv2.adaptiveThreshold(
             denoised, 255, 
             cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-            cv2.THRESH_BINARY, 11, 2
+            cv2.THRESH_BINARY, params['block_size'], params['threshold_c']
         )
         
-        # 傾斜校正（簡化版）
-        corrected = self._deskew(binary)
+        # 傾斜校正
+        deskew_start = time.perf_counter()
+        corrected, angle = EssayGradingSystem._deskew_with_angle(binary, params)
+        
+        if timings is not None:
+            timings['preprocess'] = deskew_start - start
+            timings['deskew'] = time.perf_counter() - deskew_start
         
-        return corrected
+        return corrected, {'deskew_angle': angle, 'scale': scale, 'char_height': char_height}
     
-    def _deskew(self, image: np.ndarray) -> np.ndarray:
+    @staticmethod
+    def _deskew(image: np.ndarray, params: Optional[Dict] = None) -> np.ndarray:
         """傾斜校正"""
-        coords = np.column_stack(np.where(image > 0))
-        angle = cv2.minAreaRect(coords)[-1]
+        rotated, _ = EssayGradingSystem._deskew_with_angle(image, params)
+        return rotated
+    
+    @staticmethod
+    def _deskew_with_angle(image: np.ndarray, params: Optional[Dict] = None) -> Tuple[np.ndarray, float]:
+        """
+        傾斜校正，返回 (校正後圖片, 實際旋轉角度)
+        
+        先將二值化圖片縮小，只取前景（墨跡，黑色像素）的座標估計傾斜角度，
+        避免在高解析度掃描上為整頁白色背景建立座標陣列。
+        角度小於 deskew_min_angle 時不旋轉，返回角度 0。
+        旋轉角度以逆時針為正（同 cv2.getRotationMatrix2D）。
+        """
+        import cv2
+        
+        params = params or DEFAULT_PREPROCESS_PARAMS
         
-        if angle < -45:
-            angle = -(90 + angle)
+        # 縮圖估計角度
+        (h, w) = image.shape[:2]
+        scale = min(1.0, params['deskew_max_side'] / max(h, w))
+        if scale < 1.0:
+            small = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
         else:
-            angle = -angle
+            small = image
+        
+        # 前景（墨跡）像素
+        _, ink = cv2.threshold(small, 127, 255, cv2.THRESH_BINARY_INV)
+        coords = cv2.findNonZero(ink)
+        if coords is None or len(coords) < 10:
+            return image, 0.0
+        
+        angle = cv2.minAreaRect(coords)[-1]
+        
+        # minAreaRect 的角度範圍依 OpenCV 版本不同（[-90, 0) 或 (0, 90]），
+        # 統一換算到 [-45, 45)
+        while angle >= 45:
+            angle -= 90
+        while angle < -45:
+            angle += 90
+        
+        if abs(angle) < params['deskew_min_angle']:
+            return image, 0.0
         
         # 旋轉圖片
-        (h, w) = image.shape[:2]
         center = (w // 2, h // 2)
         M = cv2.getRotationMatrix2D(center, angle, 1.0)
         rotated = cv2.warpAffine(
@@ -99,31 +753,555 @@ class EssayGradingSystem:
             borderMode=cv2.BORDER_REPLICATE
         )
         
-        return rotated
+        return rotated, float(angle)
     
-    def icr_recognize(self, image_path: str) -> Dict:
+    def icr_recognize(self, image_path: Union[str, np.ndarray],
+                      on_region: Optional[Callable[[Dict, EssayFeatureAccumulator], None]] = None) -> Dict:
         """
         ICR 文字辨識
         
+        image_path: 圖片路徑，或已讀取的圖片陣列（BGR 或灰階）
+        on_region: 每整理完一個辨識區塊即呼叫 on_region(區塊, 特徵累加器)，
+                   可用 accumulator.features() 與 score_essay 顯示即時進度與暫定分數。
+                   辨識器一次辨識整頁所有區塊（EasyOCR 會依整頁區塊的位置排序後才辨識），
+                   因此事件在整頁辨識完成後才依閱讀順序逐區塊送出，而非辨識器每產出一個區塊即送出；
+                   快取命中與重複上傳的頁面同樣依序重送。批次辨識（icr_recognize_batch）不支援 on_region
+        
         返回：
         {
             'text': 辨識的文字,
             'confidence': 平均信心度,
-            'details': 詳細辨識結果
+            'details': 詳細辨識結果,
+            'features': 作文特徵（同 analyze_essay）
         }
+        
+        設定頁面分流且頁面無法辨識時拋出 UnreadablePageError（其 triage 為分流報告）
+        """
+        self._log(f"正在辨識圖片：{_image_label(image_path)}")
+        
+        # 查詢快取、讀圖、分流與前處理
+        page = self._prepare_page(image_path)
+        if 'result' in page:
+            icr_result = page['result']
+            if page['cached']:
+                self._log(f"✓ 使用快取的辨識結果，平均信心度：{icr_result['confidence']:.2%}")
+            else:
+                # 空白、無法辨識與重複上傳的頁面不送 OCR（快取命中後分流者亦同）
+                self._log_triaged(icr_result)
+            # 重複上傳的頁面重送原結果的區塊，空白頁沒有區塊
+            self._replay_regions(icr_result, on_region)
+            return icr_result
+        
+        # ICR 辨識（偵測與辨識分開計時）
+        [(_, results, ocr_timings)] = self._readtext_batched(
+            [(0, page['image'], page['boxes'])], batch_size=1
+        )
+        icr_result = self._finish_page(page, results, ocr_timings, on_region)
+        
+        self._log(f"✓ 辨識完成，平均信心度：{icr_result['confidence']:.2%}")
+        
+        return icr_result
+    
+    def prepare_page(self, image_path: Union[str, np.ndarray]) -> Dict:
+        """
+        辨識前的準備：查詢快取、讀圖、頁面分流與前處理（不使用 ICR 模型，可在多個執行緒中同時呼叫）
+        
+        返回的頁面交給 recognize_prepared 辨識；服務可在模型執行緒以外先行準備，
+        模型執行緒只做偵測與辨識（對齊答案卷範本也在此完成）。無法處理的圖片返回 {'result': {'image_path': ..., 'error': 錯誤訊息}}
+        """
+        try:
+            return self._prepare_page(image_path)
+        except Exception as e:
+            return {'result': {'image_path': _image_label(image_path), 'error': str(e)}, 'cached': False}
+    
+    def recognize_prepared(self, pages: List[Dict], batch_size: int = 16) -> List[Dict]:
+        """
+        以批次方式辨識 prepare_page 準備好的頁面，返回與輸入順序相同的辨識結果（格式同 icr_recognize_batch）
+        
+        已有結果的頁面（快取命中、分流或錯誤）直接返回其結果，其餘頁面一起送進模型
+        """
+        outputs = [page.get('result') for page in pages]
+        chunk = [(index, page['image'], page['boxes']) for index, page in enumerate(pages) if 'result' not in page]
+        if chunk:
+            for index, results, ocr_timings in self._readtext_batched(chunk, batch_size):
+                outputs[index] = self._finish_page(pages[index], results, ocr_timings)
+        return outputs
+    
+    def _lookup_cache(self, image_path: Union[str, np.ndarray]) -> Tuple[Optional[Dict], Optional[str]]:
+        """
+        查詢 OCR 快取，返回 (命中的頁面, 快取鍵)；未命中時頁面為 None
+        
+        設定頁面分流時，命中的頁面同樣分流（見 _triage_cached），
+        頁面格式同 _prepare_page：{'result': 辨識結果, 'cached': 是否沿用快取結果}
+        """
+        start = time.perf_counter()
+        cache_key = self._cache_key(image_path)
+        if cache_key is None:
+            return None, None
+        
+        hit = self.ocr_cache.get(cache_key)
+        if hit is None:
+            return None, cache_key
+        
+        hit['timings'] = {'cache': time.perf_counter() - start}
+        self.metrics.inc('ocr_cache_hits')
+        if self.triage is not None:
+            icr_result = self._triage_cached(image_path, hit)
+            return {'result': icr_result, 'cached': icr_result is hit}, cache_key
+        return {'result': hit, 'cached': True}, cache_key
+    
+    def _prepare_page(self, image_path: Union[str, np.ndarray]) -> Dict:
+        """
+        prepare_page 的實作（讀圖或前處理失敗時拋出例外）
+        
+        不需送進模型的頁面返回 {'result': 辨識結果, 'cached': 是否為快取結果}，
+        其餘返回 {'label', 'image': 前處理後圖片（對上範本時為去除格線後的頁面）, 'info': 前處理資訊,
+                  'boxes': 範本作答區（對不上範本時為 None，需文字偵測）, 'timings': 各階段耗時,
+                  'triage': (分流報告, 縮圖特徵) 或 None, 'cache_key': 快取鍵或 None}
+        """
+        page, cache_key = self._lookup_cache(image_path)
+        if page is not None:
+            return page
+        
+        start = time.perf_counter()
+        img = self._load_image(image_path)
+        timings = {'load': time.perf_counter() - start}
+        
+        triage_params = self.triage.params if self.triage is not None else None
+        processed_img, preprocess_info = _prepare_array(
+            img, self.preprocess_params, triage_params, timings, self.templates
+        )
+        return self._prepared(image_path, processed_img, preprocess_info, timings, cache_key)
+    
+    def _prepared(self, image_path: Union[str, np.ndarray], processed_img: Optional[np.ndarray],
+                  preprocess_info: Dict, timings: Dict[str, float], cache_key: Optional[str]) -> Dict:
+        """依分流結果整理待辨識的頁面（格式同 _prepare_page）"""
+        triage = None
+        report = preprocess_info.pop('triage', None)
+        if report is not None:
+            signature = report.pop('signature')
+            icr_result = self._triaged_result(image_path, report, signature, timings)
+            if icr_result is not None:
+                return {'result': icr_result, 'cached': False}
+            triage = (report, signature)
+        
+        return {
+            'label': _image_label(image_path),
+            'image': processed_img,
+            'info': preprocess_info,
+            'boxes': preprocess_info.pop('template_boxes', None),
+            'timings': timings,
+            'triage': triage,
+            'cache_key': cache_key
+        }
+    
+    def _finish_page(self, page: Dict, results: List, ocr_timings: Dict[str, float],
+                     on_region: Optional[Callable[[Dict, EssayFeatureAccumulator], None]] = None) -> Dict:
+        """由辨識器的輸出產生頁面的辨識結果，並記錄供重複比對、存入快取"""
+        page['timings'].update(ocr_timings)
+        icr_result = self._build_icr_result(results, page['info'], on_region, page['timings'])
+        
+        # 只快取實際辨識的結果，不含分流報告（分流掉的頁面與命中的頁面每次重新分流）
+        if page['cache_key'] is not None:
+            self.ocr_cache.put(page['cache_key'], _without_timings(icr_result))
+        
+        if page['triage'] is not None:
+            report, signature = page['triage']
+            icr_result['triage'] = report
+            self.triage.remember(report, signature, page['label'], icr_result)
+        
+        return icr_result
+    
+    def icr_recognize_pdf(self, pdf_path: str, dpi: Optional[int] = None,
+                          workers: Optional[int] = None,
+                          chunk_size: int = 8,
+                          batch_size: int = 16) -> Dict:
+        """
+        PDF 作答本 ICR 辨識（多頁視為同一篇作文）
+        
+        每一頁直接轉為記憶體中的圖片陣列後批次辨識，
+        不經過暫存檔與 JPEG 重新壓縮；各頁文字依頁序合併。
+        dpi 為 None 時依字高自動選擇（見 choose_pdf_dpi）。
+        
+        返回格式同 icr_recognize，另含 'page_count'、轉換解析度 'dpi' 與每頁的 'pages' 結果
+        """
+        self._log(f"正在辨識 PDF：{pdf_path}")
+        
+        if dpi is None:
+            target = self.preprocess_params['target_char_height']
+            dpi = choose_pdf_dpi(pdf_path, target) if target else 300
+        
+        pages = load_pdf_pages(pdf_path, dpi=dpi, workers=workers)
+        page_results = self.icr_recognize_batch(pages, chunk_size=chunk_size, batch_size=batch_size)
+        
+        icr_result = self.merge_page_results(page_results)
+        icr_result['dpi'] = dpi
+        
+        self._log(f"✓ PDF 辨識完成（{len(pages)} 頁，{dpi} DPI），平均信心度：{icr_result['confidence']:.2%}")
+        
+        return icr_result
+    
+    def merge_page_results(self, page_results: List[Dict]) -> Dict:
+        """
+        將同一份作答本各頁的辨識結果合併為一篇作文
+        
+        任一頁辨識失敗時拋出 ValueError
+        """
+        import numpy as np
+        
+        for page_number, page_result in enumerate(page_results, 1):
+            if 'error' in page_result:
+                raise ValueError(f"第 {page_number} 頁辨識失敗：{page_result['error']}")
+        
+        # 合併各頁結果
+        details = []
+        for page_number, page_result in enumerate(page_results, 1):
+            for detail in page_result['details']:
+                details.append(dict(detail, page=page_number))
+        
+        full_text = self._post_process_text(' '.join(r['text'] for r in page_results))
+        confidences = [detail['confidence'] for detail in details]
+        avg_confidence = np.mean(confidences) if confidences else 0
+        
+        start = time.perf_counter()
+        accumulator = EssayFeatureAccumulator()
+        for detail in details:
+            accumulator.add_region(detail['bbox'], detail['text'], detail['confidence'])
+        features = accumulator.features()
+        
+        # 各階段耗時為所有頁面的總和
+        timings: Dict[str, float] = {}
+        for page_result in page_results:
+            for stage, seconds in page_result.get('timings', {}).items():
+                timings[stage] = timings.get(stage, 0.0) + seconds
+        timings['analysis'] = timings.get('analysis', 0.0) + time.perf_counter() - start
+        
+        merged = {
+            'text': full_text,
+            'confidence': avg_confidence,
+            'details': details,
+            'word_count': len(full_text),
+            'features': features,
+            'timings': timings,
+            'page_count': len(page_results),
+            'pages': page_results
+        }
+        
+        # 所有頁面皆為空白時，整份作答本視為空白
+        if page_results and all(r.get('triage', {}).get('status') == 'blank' for r in page_results):
+            merged['triage'] = {'status': 'blank', 'reasons': ['所有頁面皆為空白']}
+        
+        return merged
+    
+    def _cache_key(self, image_path: Union[str, np.ndarray]) -> Optional[str]:
+        """計算圖片的快取鍵；未啟用快取或無法讀檔時返回 None"""
+        if self.ocr_cache is None:
+            return None
+        
+        # 使用範本時辨識結果不同，範本也列入快取鍵；裝置與量化與否也會影響辨識結果。
+        # 分流參數不列入：快取只存辨識結果，命中時依目前的參數重新分流
+        params = dict(self.preprocess_params, gpu=self.gpu, quantize=self.quantize)
+        if self.templates is not None:
+            params = dict(params, templates=self.templates.fingerprint())
+        
+        if not isinstance(image_path, str):
+            # 圖片陣列：以尺寸與像素內容計算
+            image_bytes = str(image_path.shape).encode('utf-8') + image_path.tobytes()
+            return self.ocr_cache.make_key(image_bytes, params, self.languages)
+        try:
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+        except OSError:
+            return None
+        return self.ocr_cache.make_key(image_bytes, params, self.languages)
+    
+    def icr_recognize_batch(self, image_paths: List[Union[str, np.ndarray]],
+                            chunk_size: int = 8,
+                            batch_size: int = 16,
+                            workers: int = 0,
+                            max_pending: Optional[int] = None) -> List[Dict]:
+        """
+        批次 ICR 文字辨識
+        
+        一次前處理多張圖片，並透過 EasyOCR 的 readtext_batched
+        讓偵測器與辨識器以批次方式處理多頁內容。
+        
+        參數：
+        - chunk_size: 每次送進偵測器的頁數
+        - batch_size: 辨識器每批處理的文字區塊數
+        - workers: 前處理子行程數量（0 表示在主行程中依序前處理）
+        - max_pending: 已送出但尚未辨識的頁數上限（預設為 2 × chunk_size）
+        
+        返回：與輸入順序相同的結果列表，格式同 icr_recognize；
+        無法處理的圖片返回 {'image_path': ..., 'error': 錯誤訊息}
+        """
+        return [
+            icr_result for _, icr_result in self.iter_icr_recognize_batch(
+                image_paths,
+                chunk_size=chunk_size,
+                batch_size=batch_size,
+                workers=workers,
+                max_pending=max_pending
+            )
+        ]
+    
+    def iter_icr_recognize_batch(self, image_paths: List[Union[str, np.ndarray]],
+                                 chunk_size: int = 8,
+                                 batch_size: int = 16,
+                                 workers: int = 0,
+                                 max_pending: Optional[int] = None
+                                 ) -> Iterator[Tuple[int, Dict]]:
         """
-        print(f"正在辨識圖片：{image_path}")
+        串流版的批次 ICR 辨識，依輸入順序逐筆產出 (索引, 辨識結果)
         
-        # 前處理
-        processed_img = self.preprocess_image(image_path)
+        workers > 0 時，前處理（讀圖、灰階、去噪、二值化、傾斜校正）
+        交由子行程池執行，主行程同時進行 OCR 推論，兩者得以重疊。
+        送出的前處理工作數受 max_pending 限制，避免佇列無限增長。
+        """
+        # 快取命中的結果先暫存，待輪到其順序時再產出
+        cached: Dict[int, Dict] = {}
+        cache_keys: Dict[int, str] = {}
+        
+        def uncached():
+            for index, image_path in enumerate(image_paths):
+                try:
+                    page, cache_key = self._lookup_cache(image_path)
+                except Exception as e:
+                    page, cache_key = {'result': {'image_path': _image_label(image_path), 'error': str(e)}}, None
+                if page is not None:
+                    cached[index] = page['result']
+                    continue
+                if cache_key is not None:
+                    cache_keys[index] = cache_key
+                yield index, image_path
+        
+        preprocessed = self._iter_preprocessed(uncached(), workers, max_pending or 2 * chunk_size)
+        
+        while True:
+            # 取出一批已前處理完成的頁面
+            pages: Dict[int, Dict] = {}
+            outputs: Dict[int, Dict] = {}
+            for index, image_path, processed_img, preprocess_info, error, page_timings in preprocessed:
+                if error is not None:
+                    outputs[index] = {'image_path': _image_label(image_path), 'error': error}
+                else:
+                    page = self._prepared(image_path, processed_img, preprocess_info, page_timings,
+                                          cache_keys.pop(index, None))
+                    if 'result' in page:
+                        outputs[index] = page['result']
+                    else:
+                        pages[index] = page
+                if len(pages) + len(outputs) >= chunk_size:
+                    break
+            
+            if not pages and not outputs:
+                # 剩餘皆為快取命中
+                for index in sorted(cached):
+                    yield index, cached.pop(index)
+                return
+            
+            if pages:
+                self._log(f"正在批次辨識 {len(pages)} 張圖片")
+                
+                chunk = [(index, page['image'], page['boxes']) for index, page in pages.items()]
+                for index, results, ocr_timings in self._readtext_batched(chunk, batch_size):
+                    outputs[index] = self._finish_page(pages[index], results, ocr_timings)
+            
+            # 同時產出排在這批之前的快取結果，維持輸入順序
+            last = max(outputs)
+            for index in [i for i in cached if i < last]:
+                outputs[index] = cached.pop(index)
+            
+            for index in sorted(outputs):
+                yield index, outputs[index]
+    
+    def _iter_preprocessed(self, indexed_paths: Iterator[Tuple[int, Union[str, np.ndarray]]], workers: int,
+                           max_pending: int) -> Iterator[Tuple[int, str, np.ndarray, Dict, Optional[str], Dict]]:
+        """
+        依輸入順序產出 (索引, 路徑, 前處理後圖片, 前處理資訊, 錯誤訊息, 各階段耗時)
+        
+        使用子行程池時，最多同時有 max_pending 張圖片在前處理或等待辨識，
+        主行程每取走一張才補送下一張（背壓）。
+        設定頁面分流時，分流結果放在前處理資訊的 'triage'；未通過分流的頁面不做前處理。
+        設定答案卷範本時，對齊範本也在前處理中完成（見 _prepare_array）。
+        """
+        triage_params = self.triage.params if self.triage is not None else None
+        
+        if workers <= 0:
+            for index, image_path in indexed_paths:
+                processed_img, preprocess_info, error, timings = _preprocess_job(
+                    image_path, self.preprocess_params, triage_params, self.templates
+                )
+                yield index, image_path, processed_img, preprocess_info, error, timings
+            return
+        
+        from concurrent.futures import ProcessPoolExecutor
+        
+        # 子行程同樣限制 OpenCV 執行緒數
+        pool_kwargs = {'initializer': _init_preprocess_worker, 'initargs': (self.cpu_threads,)} if self.cpu_threads else {}
+        with ProcessPoolExecutor(max_workers=workers, **pool_kwargs) as pool:
+            pending = deque()
+            remaining = iter(indexed_paths)
+            
+            def fill():
+                while len(pending) < max_pending:
+                    try:
+                        index, image_path = next(remaining)
+                    except StopIteration:
+                        return
+                    pending.append((index, image_path, pool.submit(
+                        _preprocess_job, image_path, self.preprocess_params, triage_params, self.templates
+                    )))
+            
+            fill()
+            while pending:
+                index, image_path, future = pending.popleft()
+                processed_img, preprocess_info, error, timings = future.result()
+                fill()
+                yield index, image_path, processed_img, preprocess_info, error, timings
+    
+    def _triaged_result(self, image_path: Union[str, np.ndarray], report: Dict,
+                        signature: np.ndarray, timings: Dict[str, float]) -> Optional[Dict]:
+        """
+        依分流結果直接產生辨識結果；需要送 OCR 的頁面返回 None
+        
+        空白頁返回無內容的結果，無法辨識的頁面返回錯誤，重複上傳的頁面沿用先前的結果
+        """
+        label = _image_label(image_path)
+        
+        if report['status'] == 'blank':
+            icr_result = self._build_icr_result([], timings=timings)
+            icr_result['triage'] = report
+            return icr_result
+        
+        if report['status'] == 'unreadable':
+            return {
+                'image_path': label,
+                'error': f"無法辨識，請重新掃描（{'、'.join(report['reasons'])}）",
+                'triage': report
+            }
+        
+        # 圖片陣列的名稱只是尺寸，不能用來判斷是否為同一頁
+        exclude = image_path if isinstance(image_path, str) else None
+        duplicate = self.triage.find_duplicate(report, signature, exclude)
+        if duplicate is None:
+            return None
+        
+        # 深複製：原結果（details、features 等）仍保存在分流索引與快取中，不與呼叫端共用
+        original_label, original = duplicate
+        icr_result = copy.deepcopy(original)
+        icr_result['triage'] = dict(
+            report,
+            status='duplicate',
+            reasons=[f"與 {original_label} 重複"],
+            duplicate_of=original_label
+        )
+        icr_result['timings'] = dict(timings)
+        return icr_result
+    
+    def _triage_cached(self, image_path: Union[str, np.ndarray], hit: Dict) -> Dict:
+        """
+        對 OCR 快取命中的頁面分流：重複上傳與空白、無法辨識的頁面返回分流結果，
+        其餘沿用快取結果並記錄供之後比對重複上傳
+        """
+        timings = hit['timings']
         
-        # ICR 辨識
-        results = self.reader.readtext(processed_img, detail=1)
+        start = time.perf_counter()
+        img = self._load_image(image_path)
+        timings['load'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        report = _triage_page(img, self.triage.params)
+        signature = report.pop('signature')
+        timings['triage'] = time.perf_counter() - start
+        
+        icr_result = self._triaged_result(image_path, report, signature, timings)
+        if icr_result is not None:
+            return icr_result
+        
+        hit['triage'] = report
+        self.triage.remember(report, signature, _image_label(image_path), hit)
+        return hit
+    
+    def _log_triaged(self, icr_result: Dict) -> Dict:
+        """單頁辨識的分流結果：無法辨識時拋出 UnreadablePageError，否則列印原因後返回"""
+        if 'error' in icr_result:
+            raise UnreadablePageError(icr_result['error'], icr_result['image_path'], icr_result['triage'])
+        triage = icr_result['triage']
+        self._log(f"✓ 頁面分流：{triage['status']}（{'、'.join(triage['reasons'])}）")
+        return icr_result
+    
+    def _readtext_batched(self, processed: List[Tuple[int, np.ndarray, Optional[List[List[int]]]]],
+                          batch_size: int) -> List[Tuple[int, List, Dict[str, float]]]:
+        """
+        以批次方式執行偵測與辨識，返回 [(索引, 辨識結果, 耗時)]
+        
+        processed 為 [(索引, 前處理後圖片, 範本作答區)]：前處理時已對上答案卷範本的頁面
+        （作答區不為 None）直接辨識作答區，其餘頁面照常偵測。
+        
+        偵測器需要相同尺寸的輸入，因此依圖片尺寸分組後再送入模型。
+        偵測與辨識分開呼叫（同 EasyOCR 的 readtext_batched），以便分別計時：
+        一組的偵測耗時平均分攤到組內各頁，辨識則逐頁計時。
+        """
+        from easyocr.utils import reformat_input_batched
+        
+        outputs = []
+        groups: Dict[Tuple[int, ...], List[Tuple[int, np.ndarray]]] = {}
+        for index, img, boxes in processed:
+            if boxes is not None:
+                start = time.perf_counter()
+                results = self.reader.recognize(
+                    img, boxes, [],
+                    detail=1, batch_size=batch_size, reformat=False
+                ) if boxes else []
+                outputs.append((index, results, {'recognition': time.perf_counter() - start}))
+                
+                self.metrics.inc('pages_recognized')
+                self.metrics.inc('template_pages')
+                continue
+            
+            groups.setdefault(img.shape, []).append((index, img))
+        
+        for items in groups.values():
+            images, images_grey = reformat_input_batched([img for _, img in items])
+            
+            start = time.perf_counter()
+            horizontal_lists, free_lists = self.reader.detect(images, reformat=False)
+            detection = (time.perf_counter() - start) / len(items)
+            
+            for (index, _), image_grey, horizontal_list, free_list in zip(
+                items, images_grey, horizontal_lists, free_lists
+            ):
+                start = time.perf_counter()
+                results = self.reader.recognize(
+                    image_grey, horizontal_list, free_list,
+                    detail=1, batch_size=batch_size, reformat=False
+                )
+                outputs.append((index, results, {
+                    'detection': detection,
+                    'recognition': time.perf_counter() - start
+                }))
+            
+            self.metrics.inc('pages_recognized', len(items))
+        
+        return outputs
+    
+    def _build_icr_result(self, results: List, preprocess_info: Optional[Dict] = None,
+                          on_region: Optional[Callable[[Dict, EssayFeatureAccumulator], None]] = None,
+                          timings: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        將 EasyOCR 的輸出整理成辨識結果，並逐區塊累加作文特徵
+        
+        timings: 先前各階段的耗時，加上本步驟（'analysis'）後放入結果的 'timings'
+        """
+        import numpy as np
         
+        start = time.perf_counter()
         # 提取文字和信心度
         recognized_text = []
         confidences = []
         details = []
+        accumulator = EssayFeatureAccumulator()
         
         for (bbox, text, confidence) in results:
             recognized_text.append(text)
@@ -133,6 +1311,10 @@ class EssayGradingSystem:
                 'confidence': confidence,
                 'bbox': bbox
             })
+            
+            accumulator.add_region(bbox, text, confidence)
+            if on_region is not None:
+                on_region(details[-1], accumulator)
         
         # 組合完整文字
         full_text = ' '.join(recognized_text)
@@ -141,16 +1323,32 @@ class EssayGradingSystem:
         full_text = self._post_process_text(full_text)
         
         avg_confidence = np.mean(confidences) if confidences else 0
+        features = accumulator.features()
         
-        print(f"✓ 辨識完成，平均信心度：{avg_confidence:.2%}")
+        timings = dict(timings or {})
+        timings['analysis'] = time.perf_counter() - start
         
         return {
             'text': full_text,
             'confidence': avg_confidence,
             'details': details,
-            'word_count': len(full_text)
+            'word_count': len(full_text),
+            'features': features,
+            'preprocess': preprocess_info or {},
+            'timings': timings
         }
     
+    @staticmethod
+    def _replay_regions(icr_result: Dict,
+                        on_region: Optional[Callable[[Dict, EssayFeatureAccumulator], None]]):
+        """將快取或重複上傳沿用的辨識區塊依序重送給 on_region，串流端與實際辨識時收到相同的事件"""
+        if on_region is None:
+            return
+        accumulator = EssayFeatureAccumulator()
+        for detail in icr_result['details']:
+            accumulator.add_region(detail['bbox'], detail['text'], detail['confidence'])
+            on_region(detail, accumulator)
+    
     def _post_process_text(self, text: str) -> str:
         """後處理：修正常見 OCR 錯誤"""
         # 移除多餘空格
@@ -177,37 +1375,41 @@ class EssayGradingSystem:
         - 段落數
         - 詞彙豐富度
         - 平均句長
-        - 錯字估計
+        - 標點符號數
+        
+        斷詞結果只計算一次並重複使用，句子與段落以預先編譯的
+        樣式各掃描一次，文法評分所需的標點數也在此一併計算。
         """
         # 基本統計
         char_count = len(text)
-        word_count = len(text.split())
         
-        # 句子分割（簡化版）
-        sentences = re.split(r'[。！？.!?]', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
-        sentence_count = len(sentences)
+        # 斷詞只做一次，字數與詞彙豐富度共用
+        words = text.split()
+        word_count = len(words)
         
-        # 段落分割
-        paragraphs = text.split('\n')
-        paragraphs = [p.strip() for p in paragraphs if p.strip()]
-        paragraph_count = len(paragraphs)
+        # 句子數：每個含非空白內容的句子恰好對應一個比對結果
+        sentence_count = len(_SENTENCE_PATTERN.findall(text))
+        
+        # 段落數：含非空白內容的行
+        paragraph_count = len(_PARAGRAPH_PATTERN.findall(text))
         
         # 詞彙豐富度（TTR = Type-Token Ratio）
-        words = text.split()
-        unique_words = set(words)
-        ttr = len(unique_words) / len(words) if words else 0
+        ttr = len(set(words)) / word_count if word_count else 0
         
         # 平均句長
         avg_sentence_length = char_count / sentence_count if sentence_count > 0 else 0
         
+        # 標點符號數量
+        punctuation_count = sum(text.count(p) for p in PUNCTUATION_MARKS)
+        
         return {
             'char_count': char_count,
             'word_count': word_count,
             'sentence_count': sentence_count,
             'paragraph_count': paragraph_count,
             'vocabulary_richness': ttr,
-            'avg_sentence_length': avg_sentence_length
+            'avg_sentence_length': avg_sentence_length,
+            'punctuation_count': punctuation_count
         }
     
     def score_essay(self, text: str, features: Dict) -> Dict:
@@ -346,7 +1548,9 @@ class EssayGradingSystem:
         score = 25  # 從滿分開始扣分
         
         # 標點符號檢查（簡化版）
-        punctuation_count = sum(text.count(p) for p in '，。！？、；：')
+        punctuation_count = features.get('punctuation_count')
+        if punctuation_count is None:
+            punctuation_count = sum(text.count(p) for p in PUNCTUATION_MARKS)
         sentence_count = features['sentence_count']
         
         # 標點使用率
@@ -405,30 +1609,189 @@ class EssayGradingSystem:
                 return grade
         return 'F'
     
+    def score_batch(self, features_table) -> Dict[str, np.ndarray]:
+        """
+        批次評分（向量化）
+        
+        features_table: 欄位式特徵表，例如 pandas DataFrame 或
+        {欄位名稱: 陣列} 的字典，需包含 analyze_essay 產生的所有特徵欄位
+        （char_count、word_count、sentence_count、paragraph_count、
+        vocabulary_richness、avg_sentence_length、punctuation_count）
+        
+        以 NumPy 分段查表一次計算 N 篇作文的四項分數、總分與等級，
+        結果與逐篇呼叫 score_essay 相同。
+        
+        返回：{'content', 'structure', 'grammar', 'vocabulary', 'total', 'grade'}
+        各為長度 N 的陣列
+        """
+        import numpy as np
+        
+        def column(name):
+            return np.asarray(features_table[name])
+        
+        def band(name, values):
+            bins, points = SCORE_BANDS[name]
+            return np.asarray(points)[np.digitize(values, bins)]
+        
+        char_count = column('char_count')
+        word_count = column('word_count')
+        sentence_count = column('sentence_count')
+        paragraph_count = column('paragraph_count')
+        ttr = column('vocabulary_richness')
+        avg_len = column('avg_sentence_length')
+        punctuation_count = column('punctuation_count')
+        
+        # 1. 內容評分（0-35）
+        content = (
+            band('content_char_count', char_count)
+            + band('content_paragraph_count', paragraph_count)
+            + band('content_vocabulary_richness', ttr)
+        )
+        content = np.minimum(content, 35)
+        
+        # 2. 結構評分（0-25）
+        structure = (
+            np.where((paragraph_count >= 4) & (paragraph_count <= 6), 10,
+                     np.where((paragraph_count >= 3) & (paragraph_count <= 7), 8, 5))
+            + band('structure_sentence_count', sentence_count)
+            + np.where((avg_len >= 15) & (avg_len <= 30), 5,
+                       np.where((avg_len >= 10) & (avg_len <= 40), 4, 3))
+        )
+        structure = np.minimum(structure, 25)
+        
+        # 3. 文法評分（0-25）：標點使用率不足時扣 5 分
+        has_sentences = sentence_count > 0
+        punct_ratio = np.divide(
+            punctuation_count, sentence_count,
+            out=np.zeros(len(sentence_count)),
+            where=has_sentences
+        )
+        grammar = np.maximum(25 - np.where(has_sentences & (punct_ratio < 0.5), 5, 0), 0)
+        
+        # 4. 用詞評分（0-15）
+        vocabulary = (
+            band('vocabulary_vocabulary_richness', ttr)
+            + band('vocabulary_word_count', word_count)
+        )
+        vocabulary = np.minimum(vocabulary, 15)
+        
+        # 總分
+        total = content + structure + grammar + vocabulary
+        
+        # 等級：依 grade_thresholds 順序取第一個符合的等級（同 _get_grade）
+        grade = np.full(len(total), 'F', dtype=object)
+        for name, threshold in reversed(list(self.grade_thresholds.items())):
+            grade[total >= threshold] = name
+        
+        return {
+            'content': content,
+            'structure': structure,
+            'grammar': grammar,
+            'vocabulary': vocabulary,
+            'total': total,
+            'grade': grade
+        }
+    
     def grade_essay_from_image(self, image_path: str) -> Dict:
         """
         完整流程：從圖片到評分
         
         返回完整結果
         """
-        print("\n" + "="*60)
-        print("開始批改作文")
-        print("="*60)
+        self._log("\n" + "="*60)
+        self._log("開始批改作文")
+        self._log("="*60)
+        
+        with self._profile(image_path):
+            # 1. ICR 辨識
+            icr_result = self.icr_recognize(image_path)
+            
+            return self.grade_icr_result(image_path, icr_result)
+    
+    def grade_essay_from_pdf(self, pdf_path: str, dpi: Optional[int] = None,
+                             workers: Optional[int] = None) -> Dict:
+        """
+        完整流程：從 PDF 作答本（可多頁）到評分
         
-        # 1. ICR 辨識
-        icr_result = self.icr_recognize(image_path)
-        text = icr_result['text']
+        返回完整結果，格式同 grade_essay_from_image
+        """
+        self._log("\n" + "="*60)
+        self._log("開始批改作文")
+        self._log("="*60)
+        
+        with self._profile(pdf_path):
+            # 1. ICR 辨識（所有頁面）
+            icr_result = self.icr_recognize_pdf(pdf_path, dpi=dpi, workers=workers)
+            
+            return self.grade_icr_result(pdf_path, icr_result)
+    
+    def grade_essays(self, image_paths: List[str],
+                     chunk_size: int = 8,
+                     batch_size: int = 16,
+                     workers: int = 0,
+                     max_pending: Optional[int] = None) -> List[Dict]:
+        """
+        批次流程：多張圖片一起辨識後逐篇評分
         
-        print(f"\n辨識文字預覽：")
-        print(f"{text[:100]}..." if len(text) > 100 else text)
+        workers > 0 時以子行程池前處理，與 OCR 推論重疊執行。
         
-        # 2. 分析作文
-        print("\n分析作文特徵...")
-        features = self.analyze_essay(text)
+        返回與輸入順序相同的結果列表；
+        無法處理的圖片返回 {'image_path': ..., 'error': 錯誤訊息}
+        """
+        return list(self.iter_grade_essays(
+            image_paths,
+            chunk_size=chunk_size,
+            batch_size=batch_size,
+            workers=workers,
+            max_pending=max_pending
+        ))
+    
+    def iter_grade_essays(self, image_paths: List[str],
+                          chunk_size: int = 8,
+                          batch_size: int = 16,
+                          workers: int = 0,
+                          max_pending: Optional[int] = None) -> Iterator[Dict]:
+        """串流版的 grade_essays，依輸入順序逐篇產出評分結果"""
+        for index, icr_result in self.iter_icr_recognize_batch(
+            image_paths,
+            chunk_size=chunk_size,
+            batch_size=batch_size,
+            workers=workers,
+            max_pending=max_pending
+        ):
+            if 'error' in icr_result:
+                self.metrics.inc('essays_failed')
+                yield icr_result
+            else:
+                yield self.grade_icr_result(image_paths[index], icr_result)
+    
+    def grade_icr_result(self, image_path: str, icr_result: Dict) -> Dict:
+        """
+        由辨識結果進行分析與評分（辨識與評分分開執行時使用，例如 HTTP 服務）
         
-        # 3. 評分
-        print("進行評分...")
-        scores = self.score_essay(text, features)
+        返回完整結果，格式同 grade_essay_from_image；各階段耗時同時計入 metrics
+        """
+        text = icr_result['text']
+        timings = dict(icr_result.get('timings', {}))
+        
+        self._log(f"\n辨識文字預覽：")
+        self._log(f"{text[:100]}..." if len(text) > 100 else text)
+        
+        # 2. 分析作文（辨識時已逐區塊累加特徵者直接使用）
+        self._log("\n分析作文特徵...")
+        start = time.perf_counter()
+        features = icr_result.get('features') or self.analyze_essay(text)
+        timings['analysis'] = timings.get('analysis', 0.0) + time.perf_counter() - start
+        
+        # 3. 評分（空白頁直接給 0 分）
+        self._log("進行評分...")
+        start = time.perf_counter()
+        if icr_result.get('triage', {}).get('status') == 'blank':
+            scores = {'content': 0, 'structure': 0, 'grammar': 0, 'vocabulary': 0,
+                      'total': 0, 'grade': self._get_grade(0)}
+        else:
+            scores = self.score_essay(text, features)
+        timings['scoring'] = time.perf_counter() - start
         
         # 4. 組合結果
         result = {
@@ -436,11 +1799,16 @@ class EssayGradingSystem:
             'icr_result': icr_result,
             'features': features,
             'scores': scores,
-            'text': text
+            'text': text,
+            'timings': timings
         }
         
+        self.metrics.observe_timings(timings)
+        self.metrics.inc('essays_graded')
+        
         # 5. 列印結果
-        self._print_result(result)
+        if self.verbose:
+            self._print_result(result)
         
         return result
     
@@ -477,109 +1845,571 @@ class EssayGradingSystem:
         print("\n" + "="*60)
 
 
+def _pdf_backend(pdf_path: Union[str, bytes]):
+    """依輸入為路徑或檔案內容，返回 pdf2image 的 (pdfinfo, convert) 函式"""
+    from pdf2image import convert_from_bytes, convert_from_path, pdfinfo_from_bytes, pdfinfo_from_path
+    
+    if isinstance(pdf_path, bytes):
+        return pdfinfo_from_bytes, convert_from_bytes
+    return pdfinfo_from_path, convert_from_path
+
+
+def choose_pdf_dpi(pdf_path: Union[str, bytes],
+                   target_char_height: float = DEFAULT_PREPROCESS_PARAMS['target_char_height'],
+                   probe_dpi: int = 72,
+                   min_dpi: int = 100,
+                   max_dpi: int = 300) -> int:
+    """
+    依字高選擇 PDF 的轉換解析度
+    
+    先以低解析度（probe_dpi）轉換所有頁面並估計字高，
+    選擇讓字最小的一頁達到 target_char_height 的解析度（限制在 min_dpi ~ max_dpi）；
+    無法估計字高時返回 max_dpi。
+    """
+    import numpy as np
+    
+    _, convert = _pdf_backend(pdf_path)
+    heights = []
+    for page in convert(pdf_path, dpi=probe_dpi, fmt='ppm', grayscale=True):
+        height = _estimate_char_height(np.asarray(page))
+        if height is not None:
+            heights.append(height)
+    
+    if not heights:
+        return max_dpi
+    
+    dpi = math.ceil(probe_dpi * target_char_height / min(heights))
+    return max(min_dpi, min(max_dpi, dpi))
+
+
+def load_pdf_pages(pdf_path: Union[str, bytes], dpi: Optional[int] = None,
+                   workers: Optional[int] = None,
+                   grayscale: bool = True) -> List[np.ndarray]:
+    """
+    將 PDF 的每一頁轉為圖片陣列
+    
+    頁面直接在記憶體中轉換（無暫存檔、無失真壓縮），
+    並由多個 poppler 子行程平行處理不同頁面。
+    
+    參數：
+    - pdf_path: PDF 路徑，或 PDF 檔案內容（bytes，例如上傳的檔案）
+    - dpi: 轉換解析度（None 表示依字高自動選擇，見 choose_pdf_dpi）
+    - workers: 平行轉換的行程數（預設為頁數與 CPU 核心數的較小值）
+    - grayscale: 是否直接轉為灰階（可省下 2/3 記憶體）
+    
+    返回：依頁序排列的圖片陣列（灰階或 BGR）
+    """
+    import numpy as np
+    
+    pdfinfo, convert = _pdf_backend(pdf_path)
+    if dpi is None:
+        dpi = choose_pdf_dpi(pdf_path)
+    
+    page_count = pdfinfo(pdf_path)['Pages']
+    if workers is None:
+        workers = min(page_count, os.cpu_count() or 1)
+    
+    pages = convert(
+        pdf_path,
+        dpi=dpi,
+        fmt='ppm',
+        grayscale=grayscale,
+        thread_count=max(1, workers)
+    )
+    
+    arrays = []
+    for page in pages:
+        array = np.asarray(page)
+        if array.ndim == 3:
+            # PIL 為 RGB，OpenCV 慣用 BGR
+            array = np.ascontiguousarray(array[:, :, ::-1])
+        arrays.append(array)
+    
+    return arrays
+
+
+def _estimate_char_height(gray: np.ndarray, probe_side: int = 1000) -> Optional[float]:
+    """
+    在縮圖上估計字高（原圖像素）；筆畫太少無法估計時返回 None
+    
+    以 Otsu 二值化後的連通元件高度估計：中文字常由數個部件組成，部件比整字矮，
+    因此取第 75 百分位數；過扁（格線、底線）或過大（外框、圖片）的元件不列入。
+    """
+    import cv2
+    import numpy as np
+    
+    h, w = gray.shape[:2]
+    scale = min(1.0, probe_side / max(h, w))
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    
+    _, ink = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(ink, connectivity=8)
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    areas = stats[1:, cv2.CC_STAT_AREA]
+    
+    keep = (heights >= 3) & (areas >= 6) & (widths <= 4 * heights) & (heights <= 0.1 * small.shape[0])
+    if np.count_nonzero(keep) < 20:
+        return None
+    
+    return float(np.percentile(heights[keep], 75)) / scale
+
+
+def _choose_scale(char_height: Optional[float], params: Dict) -> float:
+    """
+    依估計字高選擇縮放倍率
+    
+    倍率取不小於 target_char_height / 字高 的級距 2^(-k/scale_steps)，
+    縮放後的字高不低於目標，且字高相近的頁面得到相同倍率（尺寸相同，可一起批次偵測）
+    """
+    if char_height is None:
+        return 1.0
+    
+    exact = params['target_char_height'] / char_height
+    steps = params['scale_steps']
+    scale = 2 ** (-math.floor(-math.log2(exact) * steps) / steps)
+    return max(params['min_scale'], min(params['max_scale'], scale))
+
+
+def _image_label(image_path: Union[str, np.ndarray]) -> str:
+    """圖片的顯示名稱（路徑，或圖片陣列的尺寸）"""
+    if isinstance(image_path, str):
+        return image_path
+    return f"<{image_path.shape[1]}x{image_path.shape[0]} 圖片>"
+
+
+def _preprocess_job(image_path: Union[str, np.ndarray], params: Dict,
+                    triage_params: Optional[Dict] = None,
+                    templates: Optional['AnswerSheetRegistry'] = None
+                    ) -> Tuple[Optional[np.ndarray], Optional[Dict], Optional[str], Dict[str, float]]:
+    """
+    前處理工作（可在子行程執行）：返回 (前處理後圖片, 前處理資訊, 錯誤訊息, 各階段耗時)
+    
+    分流與範本對齊同 _prepare_array
+    """
+    timings: Dict[str, float] = {}
+    try:
+        start = time.perf_counter()
+        img = EssayGradingSystem._load_image(image_path)
+        timings['load'] = time.perf_counter() - start
+        
+        processed_img, preprocess_info = _prepare_array(img, params, triage_params, timings, templates)
+        return processed_img, preprocess_info, None, timings
+    except Exception as e:
+        return None, None, str(e), timings
+
+
+def _prepare_array(img: np.ndarray, params: Dict, triage_params: Optional[Dict],
+                   timings: Dict[str, float],
+                   templates: Optional['AnswerSheetRegistry'] = None) -> Tuple[Optional[np.ndarray], Dict]:
+    """
+    頁面分流、前處理與範本對齊，返回 (前處理後圖片, 前處理資訊)
+    
+    提供 triage_params 時分流結果放在前處理資訊的 'triage'；
+    空白或無法辨識的頁面不做前處理，前處理後圖片為 None。
+    提供 templates 時將頁面對齊到答案卷範本（耗時記為 'template'）：對上範本的頁面返回去除格線後的頁面，
+    前處理資訊另含 'template'（範本名稱）與 'template_boxes'（有作答的作答區，辨識時直接使用、略過文字偵測）
+    """
+    report = None
+    if triage_params is not None:
+        start = time.perf_counter()
+        report = _triage_page(img, triage_params)
+        timings['triage'] = time.perf_counter() - start
+        if report['status'] != 'ok':
+            return None, {'triage': report}
+    
+    processed_img, preprocess_info = EssayGradingSystem._preprocess_array(img, params, timings)
+    if report is not None:
+        preprocess_info['triage'] = report
+    
+    if templates is not None:
+        start = time.perf_counter()
+        matched = templates.match(processed_img)
+        timings['template'] = time.perf_counter() - start
+        if matched is not None:
+            template, boxes, processed_img = matched
+            preprocess_info['template'] = template.name
+            preprocess_info['template_boxes'] = boxes
+    return processed_img, preprocess_info
+
+
+def _triage_page(img: np.ndarray, params: Dict) -> Dict:
+    """
+    在縮圖上計算頁面的墨跡比例、對比、清晰度與感知雜湊
+    
+    返回：
+    {
+        'status': 'ok' | 'blank' | 'unreadable',
+        'reasons': 判斷原因,
+        'ink_ratio': 墨跡像素比例,
+        'contrast': 背景與墨跡的灰階差（中位數）,
+        'sharpness': 筆畫周圍的 Laplacian 變異數 / 對比²（與對比無關，越小越模糊）,
+        'dhash': 64 位元差異雜湊（十六進位）,
+        'signature': 64×64 縮圖（比對重複頁面用，不留在辨識結果中）
+    }
+    """
+    import cv2
+    import numpy as np
+    
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    h, w = gray.shape
+    scale = min(1.0, params['thumbnail_side'] / max(h, w))
+    thumbnail = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1.0 else gray
+    
+    # 墨跡：比周圍背景暗 ink_threshold_c 以上的像素
+    ink = cv2.adaptiveThreshold(
+        thumbnail, 255,
+        cv2.ADAPTIVE_THRESH_MEAN_C,
+        cv2.THRESH_BINARY_INV, params['ink_block_size'], params['ink_threshold_c']
+    )
+    ink_mask = ink > 0
+    ink_ratio = float(ink_mask.mean())
+    
+    contrast = 0.0
+    sharpness = 0.0
+    if ink_mask.any():
+        contrast = float(np.median(thumbnail)) - float(np.median(thumbnail[ink_mask]))
+        # 只看筆畫周圍的 Laplacian 變異數，並除以對比²，使其不受字數與墨色深淺影響
+        around_ink = cv2.dilate(ink, np.ones((5, 5), np.uint8)) > 0
+        laplacian = cv2.Laplacian(thumbnail, cv2.CV_64F)
+        sharpness = float(laplacian[around_ink].var()) / max(contrast, 1.0) ** 2
+    
+    # 差異雜湊：9×8 縮圖中相鄰像素的明暗關係
+    tiny = cv2.resize(thumbnail, (9, 8), interpolation=cv2.INTER_AREA)
+    dhash = np.packbits(tiny[:, 1:] > tiny[:, :-1]).tobytes().hex()
+    
+    reasons = []
+    if ink_ratio < params['blank_ink_ratio']:
+        status = 'blank'
+        reasons.append(f"墨跡比例 {ink_ratio:.4%} 低於 {params['blank_ink_ratio']:.4%}")
+    else:
+        if contrast < params['min_contrast']:
+            reasons.append(f"對比過低（{contrast:.0f}）")
+        if sharpness < params['min_sharpness']:
+            reasons.append(f"影像模糊（清晰度 {sharpness:.3f}）")
+        status = 'unreadable' if reasons else 'ok'
+    
+    return {
+        'status': status,
+        'reasons': reasons,
+        'ink_ratio': ink_ratio,
+        'contrast': contrast,
+        'sharpness': sharpness,
+        'dhash': dhash,
+        'signature': cv2.resize(thumbnail, (64, 64), interpolation=cv2.INTER_AREA)
+    }
+
+
+def _without_timings(icr_result: Dict) -> Dict:
+    """存入快取的辨識結果不含本次的耗時"""
+    return {key: value for key, value in icr_result.items() if key != 'timings'}
+
+
+def _confusion_metrics(cm: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    由混淆矩陣 confusion[..., 實際, 預測] 計算各項指標
+    
+    支援前置批次維度（例如 (重抽次數, 等級數, 等級數)），各指標依最後兩軸計算。
+    分母為 0 時該項指標為 0（同 scikit-learn 的 zero_division=0）。
+    """
+    import numpy as np
+    
+    cm = np.asarray(cm, dtype=np.float64)
+    n_labels = cm.shape[-1]
+    
+    tp = np.diagonal(cm, axis1=-2, axis2=-1)
+    support = cm.sum(axis=-1)
+    predicted = cm.sum(axis=-2)
+    total = support.sum(axis=-1)
+    
+    def ratio(numerator, denominator):
+        return np.divide(numerator, denominator, out=np.zeros(np.broadcast(numerator, denominator).shape),
+                         where=denominator > 0)
+    
+    precision = ratio(tp, predicted)
+    recall = ratio(tp, support)
+    f1 = ratio(2 * precision * recall, precision + recall)
+    
+    # macro 平均只計入實際或預測中出現過的等級
+    present = (support + predicted) > 0
+    present_count = present.sum(axis=-1)
+    
+    # Quadratic Weighted Kappa：權重 (i - j)^2，期望矩陣為實際與預測邊際分布的外積
+    grades = np.arange(n_labels)
+    weights = (grades[:, None] - grades[None, :]) ** 2
+    observed = (weights * cm).sum(axis=(-2, -1))
+    expected = ratio((weights * (support[..., :, None] * predicted[..., None, :])).sum(axis=(-2, -1)), total)
+    # 期望不一致為 0 時（全部落在同一等級）視為完全一致
+    kappa = np.where(expected > 0, 1 - ratio(observed, expected), np.where(total > 0, 1.0, 0.0))
+    
+    return {
+        'precision': precision,
+        'recall': recall,
+        'f1': f1,
+        'support': support.astype(np.int64),
+        'precision_macro': ratio((precision * present).sum(axis=-1), present_count),
+        'recall_macro': ratio((recall * present).sum(axis=-1), present_count),
+        'f1_macro': ratio((f1 * present).sum(axis=-1), present_count),
+        'f1_weighted': ratio((f1 * support).sum(axis=-1), total),
+        'precision_weighted': ratio((precision * support).sum(axis=-1), total),
+        'recall_weighted': ratio((recall * support).sum(axis=-1), total),
+        'accuracy': ratio(tp.sum(axis=-1), total),
+        'quadratic_kappa': kappa
+    }
+
+
+def _format_classification_report(labels: List[str], metrics: Dict, digits: int = 2) -> str:
+    """將 _confusion_metrics 的結果排成 scikit-learn classification_report 的文字格式"""
+    width = max(len(label) for label in list(labels) + ['weighted avg'])
+    header_fmt = '{:>{width}s} ' + ' {:>9}' * 4
+    row_fmt = '{:>{width}s} ' + ' {:>9.{digits}f}' * 3 + ' {:>9}\n'
+    
+    report = header_fmt.format('', 'precision', 'recall', 'f1-score', 'support', width=width)
+    report += '\n\n'
+    for i, label in enumerate(labels):
+        report += row_fmt.format(label, metrics['precision'][i], metrics['recall'][i],
+                                 metrics['f1'][i], int(metrics['support'][i]), width=width, digits=digits)
+    report += '\n'
+    
+    total = int(metrics['support'].sum())
+    report += ('{:>{width}s} ' + ' {:>9}' * 2 + ' {:>9.{digits}f}' + ' {:>9}\n').format(
+        'accuracy', '', '', float(metrics['accuracy']), total, width=width, digits=digits)
+    # 同 classification_report(labels=labels)：macro 平均涵蓋所有等級（未出現的等級以 0 計入）
+    report += row_fmt.format('macro avg', float(metrics['precision'].mean()), float(metrics['recall'].mean()),
+                             float(metrics['f1'].mean()), total, width=width, digits=digits)
+    report += row_fmt.format('weighted avg', float(metrics['precision_weighted']), float(metrics['recall_weighted']),
+                             float(metrics['f1_weighted']), total, width=width, digits=digits)
+    return report
+
+
+# 自助法（bootstrap）信賴區間涵蓋的指標
+BOOTSTRAP_METRICS = ('accuracy', 'f1_macro', 'quadratic_kappa')
+
+
+def _bootstrap_job(cm: np.ndarray, n_resamples: int, seed) -> Dict[str, np.ndarray]:
+    """
+    自助法重抽（可在子行程執行）：返回各指標在每次重抽下的值
+    
+    對逐筆評分結果有放回重抽 N 筆，等同於依各格比例對混淆矩陣做多項分布抽樣，
+    因此一次 rng.multinomial 即可產生全部重抽的混淆矩陣。
+    """
+    import numpy as np
+    
+    rng = np.random.default_rng(seed)
+    total = int(cm.sum())
+    samples = rng.multinomial(total, cm.ravel() / total, size=n_resamples).reshape((n_resamples,) + cm.shape)
+    metrics = _confusion_metrics(samples)
+    return {name: metrics[name] for name in BOOTSTRAP_METRICS}
+
+
+# 背景繪圖行程（不使用 GUI 後端），首次呼叫 render_reports_async 時建立
+_RENDER_EXECUTOR = None
+_RENDER_EXECUTOR_LOCK = threading.Lock()
+
+# 報表圖檔名稱
+REPORT_FILES = {
+    'confusion_matrix': 'confusion_matrix.png',
+    'metrics_comparison': 'metrics_comparison.png',
+}
+
+
+def _get_render_executor():
+    """取得共用的背景繪圖行程池（單一行程）"""
+    global _RENDER_EXECUTOR
+    with _RENDER_EXECUTOR_LOCK:
+        if _RENDER_EXECUTOR is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            
+            # 以 spawn 建立乾淨的行程，不繼承主行程已載入的模型與執行緒
+            _RENDER_EXECUTOR = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _RENDER_EXECUTOR
+
+
+def _report_digest(metrics: Dict) -> str:
+    """圖表內容的雜湊值（圖表只由等級列表與混淆矩陣決定）"""
+    import numpy as np
+    
+    digest = hashlib.sha256()
+    digest.update(json.dumps(metrics['labels'], ensure_ascii=False).encode('utf-8'))
+    digest.update(np.ascontiguousarray(metrics['confusion_matrix'], dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def _render_report_job(metrics: Dict, output_dir: str, digest: str) -> Dict[str, str]:
+    """繪製評估報表圖（在背景繪圖行程執行）：返回 {圖表名稱: 檔案路徑}"""
+    import matplotlib
+    matplotlib.use('Agg')  # 非互動式後端，不需要顯示器
+    
+    evaluator = EssayGradingEvaluator(labels=metrics['labels'])
+    paths = {name: os.path.join(output_dir, filename) for name, filename in REPORT_FILES.items()}
+    
+    os.makedirs(output_dir, exist_ok=True)
+    evaluator.plot_confusion_matrix(metrics, paths['confusion_matrix'], show=False)
+    evaluator.plot_metrics_comparison(metrics, paths['metrics_comparison'], show=False)
+    
+    # 圖檔都寫完後才記錄雜湊值，中斷時下次會重新繪製
+    with open(os.path.join(output_dir, 'report.sha256'), 'w', encoding='utf-8') as f:
+        f.write(digest)
+    return paths
+
+
 class EssayGradingEvaluator:
-    """評估系統效能"""
+    """
+    評估系統效能
     
-    def __init__(self):
-        self.predictions = []
-        self.ground_truth = []
+    以整數混淆矩陣累計評分結果（不保留逐筆預測），記憶體用量固定；
+    各工作行程可各自累計後再以 merge 合併。
+    """
+    
+    def __init__(self, labels: Optional[List[str]] = None):
+        """
+        labels: 等級列表（由高到低，計算加權 Kappa 時視為有序），預設為 GRADE_LABELS
+        """
+        import numpy as np
+        
+        self.labels = list(labels) if labels is not None else list(GRADE_LABELS)
+        self._label_index = {label: i for i, label in enumerate(self.labels)}
+        
+        # confusion[實際, 預測]
+        self.confusion = np.zeros((len(self.labels), len(self.labels)), dtype=np.int64)
+    
+    @property
+    def count(self) -> int:
+        """已累計的評分筆數"""
+        return int(self.confusion.sum())
+    
+    def _index_of(self, grade: str) -> int:
+        try:
+            return self._label_index[grade]
+        except KeyError:
+            raise ValueError(f"未知的等級：{grade!r}（可用等級：{self.labels}）") from None
     
     def add_result(self, predicted_grade: str, true_grade: str):
         """添加一筆評分結果"""
-        self.predictions.append(predicted_grade)
-        self.ground_truth.append(true_grade)
+        self.confusion[self._index_of(true_grade), self._index_of(predicted_grade)] += 1
+    
+    def add_results(self, predicted_grades, true_grades):
+        """一次添加多筆評分結果"""
+        import numpy as np
+        
+        predicted = np.fromiter((self._index_of(g) for g in predicted_grades), dtype=np.intp)
+        actual = np.fromiter((self._index_of(g) for g in true_grades), dtype=np.intp)
+        if len(predicted) != len(actual):
+            raise ValueError(f"預測筆數（{len(predicted)}）與實際筆數（{len(actual)}）不一致")
+        
+        np.add.at(self.confusion, (actual, predicted), 1)
+    
+    def merge(self, other: 'EssayGradingEvaluator') -> 'EssayGradingEvaluator':
+        """合併另一個評估器（例如其他工作行程）的累計結果，返回 self"""
+        if other.labels != self.labels:
+            raise ValueError(f"等級列表不一致，無法合併：{self.labels} / {other.labels}")
+        self.confusion += other.confusion
+        return self
     
-    def calculate_metrics(self) -> Dict:
+    def calculate_metrics(self, bootstrap: int = 0,
+                          confidence: float = 0.95,
+                          seed: Optional[int] = None,
+                          workers: int = 0) -> Dict:
         """
         計算評估指標
         
+        bootstrap > 0 時另以該次數的自助法重抽估計信賴區間（見 bootstrap_intervals），
+        結果放在 'confidence_intervals'。
+        
         返回：
         - Confusion Matrix
         - Precision (每個類別 + 平均)
         - Recall (每個類別 + 平均)
         - F1 Score (每個類別 + 平均)
         - Accuracy
+        - Quadratic Weighted Kappa
+        
+        平均指標只計入實際或預測中出現過的等級（同 scikit-learn 未指定 labels 時的 macro 平均）。
         """
-        from sklearn.metrics import (
-            confusion_matrix, 
-            classification_report,
-            accuracy_score,
-            precision_recall_fscore_support
-        )
+        cm = self.confusion.copy()
+        metrics = _confusion_metrics(cm)
         
-        # 等級列表
-        labels = ['A+', 'A', 'B', 'C', 'D', 'F']
+        result = {
+            'confusion_matrix': cm,
+            'labels': list(self.labels),
+            'precision': metrics['precision'],
+            'recall': metrics['recall'],
+            'f1': metrics['f1'],
+            'support': metrics['support'],
+            'precision_macro': float(metrics['precision_macro']),
+            'recall_macro': float(metrics['recall_macro']),
+            'f1_macro': float(metrics['f1_macro']),
+            'accuracy': float(metrics['accuracy']),
+            'quadratic_kappa': float(metrics['quadratic_kappa']),
+            'classification_report': _format_classification_report(self.labels, metrics)
+        }
         
-        # Confusion Matrix
-        cm = confusion_matrix(
-            self.ground_truth, 
-            self.predictions, 
-            labels=labels
-        )
+        if bootstrap > 0:
+            result['confidence_intervals'] = self.bootstrap_intervals(
+                n_resamples=bootstrap, confidence=confidence, seed=seed, workers=workers
+            )
         
-        # Precision, Recall, F1
-        precision, recall, f1, support = precision_recall_fscore_support(
-            self.ground_truth,
-            self.predictions,
-            labels=labels,
-            average=None,
-            zero_division=0
-        )
+        return result
+    
+    def bootstrap_intervals(self, n_resamples: int = 2000,
+                            confidence: float = 0.95,
+                            seed: Optional[int] = None,
+                            workers: int = 0) -> Dict:
+        """
+        以自助法估計 Accuracy、平均 F1、加權 Kappa 的信賴區間（百分位數法）
         
-        # 平均指標
-        precision_macro = precision_recall_fscore_support(
-            self.ground_truth,
-            self.predictions,
-            average='macro',
-            zero_division=0
-        )[0]
-        
-        recall_macro = precision_recall_fscore_support(
-            self.ground_truth,
-            self.predictions,
-            average='macro',
-            zero_division=0
-        )[1]
-        
-        f1_macro = precision_recall_fscore_support(
-            self.ground_truth,
-            self.predictions,
-            average='macro',
-            zero_division=0
-        )[2]
-        
-        # Accuracy
-        accuracy = accuracy_score(self.ground_truth, self.predictions)
-        
-        # Classification Report
-        report = classification_report(
-            self.ground_truth,
-            self.predictions,
-            labels=labels,
-            target_names=labels,
-            zero_division=0
-        )
+        參數：
+        - n_resamples: 重抽次數
+        - confidence: 信賴水準
+        - seed: 亂數種子（相同種子與 workers 可重現結果）
+        - workers: 重抽子行程數量（0 表示在主行程中計算）
         
-        return {
-            'confusion_matrix': cm,
-            'labels': labels,
-            'precision': precision,
-            'recall': recall,
-            'f1': f1,
-            'support': support,
-            'precision_macro': precision_macro,
-            'recall_macro': recall_macro,
-            'f1_macro': f1_macro,
-            'accuracy': accuracy,
-            'classification_report': report
+        返回：{指標名稱: (下界, 上界), 'confidence': 信賴水準, 'n_resamples': 重抽次數}
+        """
+        import numpy as np
+        
+        if self.count == 0:
+            raise ValueError("尚未添加任何評分結果，無法估計信賴區間")
+        if n_resamples < 1:
+            raise ValueError(f"重抽次數至少為 1（n_resamples={n_resamples}）")
+        
+        cm = self.confusion.copy()
+        seed_sequence = np.random.SeedSequence(seed)
+        
+        if workers <= 0:
+            samples = _bootstrap_job(cm, n_resamples, seed_sequence)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+            
+            # 各子行程使用獨立的亂數串流，重抽次數平均分配
+            sizes = [n_resamples // workers + (1 if i < n_resamples % workers else 0) for i in range(workers)]
+            jobs = [(size, child) for size, child in zip(sizes, seed_sequence.spawn(workers)) if size > 0]
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+                parts = list(pool.map(_bootstrap_job, [cm] * len(jobs), *zip(*jobs)))
+            samples = {name: np.concatenate([part[name] for part in parts]) for name in BOOTSTRAP_METRICS}
+        
+        alpha = (1 - confidence) / 2
+        intervals = {
+            name: tuple(float(v) for v in np.quantile(samples[name], [alpha, 1 - alpha]))
+            for name in BOOTSTRAP_METRICS
         }
+        intervals['confidence'] = confidence
+        intervals['n_resamples'] = n_resamples
+        return intervals
     
-    def plot_confusion_matrix(self, metrics: Dict, save_path: str = None):
-        """繪製混淆矩陣"""
+    def plot_confusion_matrix(self, metrics: Dict, save_path: str = None, show: bool = True):
+        """繪製混淆矩陣（show=False 時不顯示視窗，只儲存圖檔）"""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        
         cm = metrics['confusion_matrix']
         labels = metrics['labels']
         
-        plt.figure(figsize=(10, 8))
+        fig = plt.figure(figsize=(10, 8))
         sns.heatmap(
             cm, 
             annot=True, 
@@ -598,10 +2428,15 @@ class EssayGradingEvaluator:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"✓ 混淆矩陣已儲存：{save_path}")
         
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
     
-    def plot_metrics_comparison(self, metrics: Dict, save_path: str = None):
-        """繪製各等級的 Precision, Recall, F1 比較圖"""
+    def plot_metrics_comparison(self, metrics: Dict, save_path: str = None, show: bool = True):
+        """繪製各等級的 Precision, Recall, F1 比較圖（show=False 時不顯示視窗，只儲存圖檔）"""
+        import numpy as np
+        import matplotlib.pyplot as plt
+        
         labels = metrics['labels']
         precision = metrics['precision']
         recall = metrics['recall']
@@ -646,7 +2481,37 @@ class EssayGradingEvaluator:
             plt.savefig(save_path, dpi=300, bbox_inches='tight')
             print(f"✓ 指標比較圖已儲存：{save_path}")
         
-        plt.show()
+        if show:
+            plt.show()
+        plt.close(fig)
+    
+    def render_reports_async(self, metrics: Dict, output_dir: str = 'results/reports'):
+        """
+        在背景行程繪製並儲存混淆矩陣與指標比較圖，不阻塞呼叫端
+        
+        指標與上次繪製時相同（output_dir 內的 report.sha256 相符且圖檔都在）時直接略過。
+        
+        返回：concurrent.futures.Future，結果為 {圖表名稱: 檔案路徑}
+        """
+        from concurrent.futures import Future
+        
+        digest = _report_digest(metrics)
+        paths = {name: os.path.join(output_dir, filename) for name, filename in REPORT_FILES.items()}
+        
+        try:
+            with open(os.path.join(output_dir, 'report.sha256'), 'r', encoding='utf-8') as f:
+                unchanged = f.read() == digest and all(os.path.exists(path) for path in paths.values())
+        except OSError:
+            unchanged = False
+        
+        if unchanged:
+            future = Future()
+            future.set_result(paths)
+            return future
+        
+        # 只傳送繪圖需要的欄位
+        payload = {key: metrics[key] for key in ('confusion_matrix', 'labels', 'precision', 'recall', 'f1')}
+        return _get_render_executor().submit(_render_report_job, payload, output_dir, digest)
     
     def print_summary(self, metrics: Dict):
         """列印評估摘要"""
@@ -655,10 +2520,21 @@ class EssayGradingEvaluator:
         print("="*60)
         
         print(f"\n【整體指標】")
-        print(f"  準確率（Accuracy）: {metrics['accuracy']:.4f} ({metrics['accuracy']*100:.2f}%)")
+        intervals = metrics.get('confidence_intervals')
+        
+        def interval(name):
+            if not intervals:
+                return ""
+            low, high = intervals[name]
+            return f"  [{intervals['confidence']*100:.0f}% CI {low:.4f} ~ {high:.4f}]"
+        
+        print(f"  準確率（Accuracy）: {metrics['accuracy']:.4f} ({metrics['accuracy']*100:.2f}%){interval('accuracy')}")
         print(f"  平均精確率（Precision）: {metrics['precision_macro']:.4f}")
         print(f"  平均召回率（Recall）: {metrics['recall_macro']:.4f}")
-        print(f"  平均 F1 分數（F1 Score）: {metrics['f1_macro']:.4f}")
+        print(f"  平均 F1 分數（F1 Score）: {metrics['f1_macro']:.4f}{interval('f1_macro')}")
+        print(f"  加權 Kappa（Quadratic Weighted Kappa）: {metrics['quadratic_kappa']:.4f}{interval('quadratic_kappa')}")
+        if intervals:
+            print(f"  （信賴區間由 {intervals['n_resamples']} 次自助法重抽估計）")
         
         print(f"\n【各等級詳細指標】")
         labels = metrics['labels']
@@ -682,7 +2558,7 @@ class EssayGradingEvaluator:
 if __name__ == "__main__":
     # 初始化系統
     print("初始化 AI 作文批改系統...")
-    system = EssayGradingSystem(languages=['ch_sim', 'en'])
+    system = EssayGradingSystem(languages=['ch_sim', 'en'], verbose=True)
     
     # 批改單篇作文
     result = system.grade_essay_from_image('essay_sample.jpg')
@@ -0,0 +1,190 @@
+"""
+逐篇作文的效能剖析（選用）
+以背景執行緒定期取樣批改執行緒的呼叫堆疊，輸出 collapsed stack 檔
+（可用 flamegraph.pl、speedscope 等工具繪製火焰圖），並記錄各階段的記憶體峰值。
+
+只剖析選定的作文：每 N 篇一篇，或耗時超過門檻者；
+未啟用（EssayGradingSystem 的 profiler 為 None）時不會有任何額外負擔。
+
+使用方式：
+    profiler = EssayProfiler('results/profiles', every=100, slow_threshold=10.0)
+    system = EssayGradingSystem(profiler=profiler)
+"""
+
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+# 依函式名稱判斷取樣當下所在的批改階段（由最內層往外找第一個符合者）
+STAGE_FUNCTIONS = {
+    '_load_image': 'load',
+    '_triage_page': 'triage',
+    '_deskew_with_angle': 'deskew',
+    '_preprocess_array': 'preprocess',
+    '_analyze': 'template',
+    'detect': 'detection',
+    'recognize': 'recognition',
+    '_build_icr_result': 'analysis',
+    'analyze_essay': 'analysis',
+    'score_essay': 'scoring',
+}
+
+
+def _resident_bytes() -> Optional[int]:
+    """目前行程的常駐記憶體（位元組）；無法取得時返回 None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class _StackSampler(threading.Thread):
+    """定期取樣指定執行緒的呼叫堆疊與行程記憶體"""
+    
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name='essay-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.stage_samples: Counter = Counter()
+        self.stage_peak_bytes: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            
+            names = []
+            stage = None
+            while frame is not None:
+                code = frame.f_code
+                if stage is None:
+                    stage = STAGE_FUNCTIONS.get(code.co_name)
+                names.append((code.co_name, os.path.basename(code.co_filename), frame.f_lineno))
+                frame = frame.f_back
+            
+            # 由外而內；最內層保留行號，以區分同一函式中不同的 OpenCV / 模型呼叫
+            frames = [f"{name} ({filename})" for name, filename, _ in reversed(names[1:])]
+            name, filename, lineno = names[0]
+            frames.append(f"{name} ({filename}:{lineno})")
+            self.stacks[';'.join(frames)] += 1
+            
+            stage = stage or 'other'
+            self.stage_samples[stage] += 1
+            resident = _resident_bytes()
+            if resident is not None and resident > self.stage_peak_bytes.get(stage, 0):
+                self.stage_peak_bytes[stage] = resident
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class EssayProfiler:
+    """
+    逐篇作文的取樣剖析器
+    
+    每篇作文輸出兩個檔案（檔名為 序號_作文名稱）：
+    - .collapsed：collapsed stack 格式（每行「外層;...;內層 取樣次數」）
+    - .json：耗時、選取原因、各階段取樣數與記憶體峰值
+    
+    記憶體峰值為取樣當下的行程常駐記憶體（RSS，含 OpenCV 與模型的原生配置），
+    只在取樣點量測，極短暫的配置可能不會被捕捉到。
+    """
+    
+    def __init__(self, output_dir: str = 'results/profiles',
+                 every: int = 0,
+                 slow_threshold: Optional[float] = None,
+                 interval: float = 0.005):
+        """
+        output_dir: 剖析結果輸出資料夾
+        every: 每 every 篇剖析一篇（0 表示不依篇數選取）
+        slow_threshold: 耗時超過此秒數的作文也輸出剖析結果
+                        （需對每篇取樣，取樣本身約增加 1% 以內的負擔）
+        interval: 取樣間隔（秒）
+        """
+        self.output_dir = output_dir
+        self.every = every
+        self.slow_threshold = slow_threshold
+        self.interval = interval
+        
+        self._lock = threading.Lock()
+        self._count = 0
+        self.written: List[str] = []
+    
+    @property
+    def enabled(self) -> bool:
+        return self.every > 0 or self.slow_threshold is not None
+    
+    def is_sampled(self, offset: int = 0) -> bool:
+        """之後第 offset 篇（0 為下一篇）是否會依篇數選取剖析"""
+        with self._lock:
+            return self.every > 0 and (self._count + offset) % self.every == 0
+    
+    def skip(self, essays: int = 1):
+        """略過 essays 篇不剖析的作文（例如批次批改的作文），只佔用序號"""
+        with self._lock:
+            self._count += essays
+    
+    @contextmanager
+    def profile(self, label: str) -> Iterator[None]:
+        """剖析一篇作文的批改過程（在批改的執行緒中使用）"""
+        with self._lock:
+            number = self._count
+            self._count += 1
+        
+        sampled = self.every > 0 and number % self.every == 0
+        if not sampled and self.slow_threshold is None:
+            yield
+            return
+        
+        sampler = _StackSampler(threading.get_ident(), self.interval)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            sampler.stop()
+            
+            if sampled:
+                reason = f'every {self.every}'
+            elif duration >= self.slow_threshold:
+                reason = f'slower than {self.slow_threshold}s'
+            else:
+                reason = None
+            
+            if reason is not None:
+                self._write(number, label, duration, reason, sampler)
+    
+    def _write(self, number: int, label: str, duration: float, reason: str, sampler: _StackSampler):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"{number:06d}_{re.sub(r'[^0-9A-Za-z._-]+', '_', os.path.basename(label))[:80]}"
+        base = os.path.join(self.output_dir, name)
+        
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        
+        summary = {
+            'label': label,
+            'duration_seconds': duration,
+            'reason': reason,
+            'interval_seconds': self.interval,
+            'samples': sum(sampler.stacks.values()),
+            'stage_samples': dict(sampler.stage_samples),
+            'stage_peak_rss_bytes': sampler.stage_peak_bytes
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        
+        self.written.append(base)
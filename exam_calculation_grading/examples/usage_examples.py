@@ -103,6 +103,40 @@ def example_3_custom_tolerance():
     print(report)
 
 
+def example_4_cohort_grading():
+    """範例4: 整批評分"""
+    print("\n" + "=" * 60)
+    print("範例4: 整批評分（整個試場一次計算）")
+    print("=" * 60)
+    
+    grader = AnswerGrader()
+    
+    grader.set_standard_answer({
+        '電流': 100.0,
+        '電壓': 220.0,
+    })
+    
+    grader.add_criterion('電流', max_score=10.0, tolerance=0.02)
+    grader.add_criterion('電壓', max_score=5.0, tolerance=0.01)
+    
+    # 每列一位考生、欄位順序同 grader.cohort_items()，未作答填 NaN
+    answers = grader.build_answer_matrix([
+        {'電流': 99.5, '電壓': 220.0},
+        {'電流': 104.0, '電壓': 230.0},
+        {'電流': 150.0},
+    ])
+    
+    cohort = grader.grade_cohort(answers, has_diagram=[True, False, False],
+                                 student_ids=['S001', 'S002', 'S003'])
+    
+    for student_id, total in zip(cohort.student_ids, cohort.total_scores):
+        print(f"{student_id}: {total:.1f} 分")
+    
+    # 每位考生一份報告，寫入單一壓縮檔（也可指定資料夾）
+    count = grader.write_reports(cohort, 'reports.zip')
+    print(f"已寫入 {count} 份評分報告至 reports.zip")
+
+
 if __name__ == "__main__":
     print("AI 自動評分系統 - 使用範例\n")
     
@@ -110,6 +144,7 @@ if __name__ == "__main__":
     example_1_basic_grading()
     example_2_with_diagram()
     example_3_custom_tolerance()
+    example_4_cohort_grading()
     
     print("\n" + "=" * 60)
     print("如需更多資訊，請參閱:")
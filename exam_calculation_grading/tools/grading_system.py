@@ -6,11 +6,39 @@
 真正的自動評分系統需要大量訓練資料（數百到數千份已評分答案）
 """
 
+import os
 import re
 import math
-from typing import Dict, List, Tuple
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
 
+import numpy as np
+
+# 繪製相量圖的加分
+DIAGRAM_BONUS = 2.0
+
+# 評語代碼（依誤差率分段）
+FEEDBACK_CORRECT = 0      # 誤差在容許範圍內
+FEEDBACK_MINOR_ERROR = 1  # 容許誤差 3 倍內
+FEEDBACK_MAJOR_ERROR = 2  # 容許誤差 10 倍內
+FEEDBACK_WRONG = 3        # 超過容許誤差 10 倍
+FEEDBACK_UNANSWERED = 4   # 未作答
+
+# 各評語代碼的評語範本（error_pct 為誤差率百分比）
+FEEDBACK_TEMPLATES = {
+    FEEDBACK_CORRECT: "✅ 完全正確（誤差率: {error_pct:.2f}%）",
+    FEEDBACK_MINOR_ERROR: "⚠️ 有小誤差（誤差率: {error_pct:.2f}%），給予部分分數",
+    FEEDBACK_MAJOR_ERROR: "⚠️ 計算錯誤較大（誤差率: {error_pct:.2f}%），給予基本分數",
+    FEEDBACK_WRONG: "❌ 答案錯誤（誤差率: {error_pct:.2f}%）",
+    FEEDBACK_UNANSWERED: "❌ 未作答或無法辨識",
+}
+
+# 各評語代碼的得分比例（索引為評語代碼）
+CREDIT_RATIOS = np.array([1.0, 0.7, 0.3, 0.0, 0.0])
+
 @dataclass
 class Answer:
     """答案資料結構"""
@@ -37,6 +65,94 @@ class GradingResult:
     error_rate: float
     feedback: str
 
+@dataclass
+class CohortGradingResult:
+    """整批考生的評分結果（每列一位考生、每欄一個評分項目）
+    
+    以欄式陣列保存：每格只存考生答案（float64）與評語代碼（int8），
+    得分、誤差率由陣列即時計算，GradingResult 與評語文字只在需要時才產生。
+    原本為整數的答案另以布林遮罩標記，報告中仍顯示為整數（同 grade_answer）。
+    """
+    criteria: List[GradingCriteria]  # 各欄的評分標準
+    standard_values: List[float]  # 各欄的標準答案
+    student_values: np.ndarray  # (考生數, 項目數)，未作答為 NaN
+    feedback_codes: np.ndarray  # (考生數, 項目數)，int8 評語代碼
+    has_diagram: np.ndarray  # (考生數,)
+    total_scores: np.ndarray  # (考生數,)，含相量圖加分
+    student_ids: Optional[List[str]] = None
+    integer_answers: Optional[np.ndarray] = None  # (考生數, 項目數)，原始答案為整數者為 True；None 表示皆非整數
+    
+    def __len__(self) -> int:
+        return len(self.total_scores)
+    
+    @property
+    def items(self) -> List[str]:
+        return [c.item for c in self.criteria]
+    
+    @property
+    def max_scores(self) -> np.ndarray:
+        return np.array([c.max_score for c in self.criteria], dtype=np.float64)
+    
+    @property
+    def error_rates(self) -> np.ndarray:
+        """(考生數, 項目數) 誤差率，未作答為 inf"""
+        return _cohort_error_rates(np.array(self.standard_values, dtype=np.float64), self.student_values)
+    
+    @property
+    def earned_scores(self) -> np.ndarray:
+        """(考生數, 項目數) 各項得分"""
+        return self.max_scores * CREDIT_RATIOS[self.feedback_codes]
+    
+    def subset(self, start: int, stop: int) -> 'CohortGradingResult':
+        """第 start 到 stop - 1 位考生的評分結果（共用原陣列）"""
+        return CohortGradingResult(
+            criteria=self.criteria,
+            standard_values=self.standard_values,
+            student_values=self.student_values[start:stop],
+            feedback_codes=self.feedback_codes[start:stop],
+            has_diagram=self.has_diagram[start:stop],
+            total_scores=self.total_scores[start:stop],
+            student_ids=self.student_ids[start:stop] if self.student_ids is not None else None,
+            integer_answers=self.integer_answers[start:stop] if self.integer_answers is not None else None
+        )
+    
+    def student_results(self, index: int) -> Tuple[List[GradingResult], float]:
+        """產生第 index 位考生的評分結果列表與總分（同 grade_answer 的返回值）"""
+        results = []
+        values = self.student_values[index]
+        codes = self.feedback_codes[index]
+        integers = self.integer_answers[index] if self.integer_answers is not None else None
+        error_rates = _cohort_error_rates(np.array(self.standard_values, dtype=np.float64), values)
+        
+        for col, criterion in enumerate(self.criteria):
+            code = int(codes[col])
+            standard_value = self.standard_values[col]
+            
+            if code == FEEDBACK_UNANSWERED:
+                student_value = None
+                error_rate = float('inf')
+                feedback = FEEDBACK_TEMPLATES[code]
+            else:
+                # 陣列只用於計算；顯示時還原原始型別，報告文字與 grade_answer 一致
+                student_value = int(values[col]) if integers is not None and integers[col] else float(values[col])
+                error_rate = float(error_rates[col])
+                feedback = FEEDBACK_TEMPLATES[code].format(error_pct=error_rate*100)
+            
+            results.append(GradingResult(
+                item=criterion.item,
+                max_score=criterion.max_score,
+                earned_score=_earned_score(criterion.max_score, code),
+                standard_value=standard_value,
+                student_value=student_value,
+                error_rate=error_rate,
+                feedback=feedback
+            ))
+        
+        if self.has_diagram[index]:
+            results.append(_diagram_result())
+        
+        return results, float(self.total_scores[index])
+
 class AnswerGrader:
     """答案評分器"""
     
@@ -77,29 +193,25 @@ class AnswerGrader:
         # 根據誤差率給分
         if error_rate <= tolerance:
             # 完全正確（誤差在容許範圍內）
-            earned_score = max_score
-            feedback = f"✅ 完全正確（誤差率: {error_rate*100:.2f}%）"
+            code = FEEDBACK_CORRECT
         elif error_rate <= tolerance * 3:
             # 部分正確（小誤差）
-            earned_score = max_score * 0.7
-            feedback = f"⚠️ 有小誤差（誤差率: {error_rate*100:.2f}%），給予部分分數"
+            code = FEEDBACK_MINOR_ERROR
         elif error_rate <= tolerance * 10:
             # 方法可能對但計算錯誤
-            earned_score = max_score * 0.3
-            feedback = f"⚠️ 計算錯誤較大（誤差率: {error_rate*100:.2f}%），給予基本分數"
+            code = FEEDBACK_MAJOR_ERROR
         else:
             # 完全錯誤
-            earned_score = 0
-            feedback = f"❌ 答案錯誤（誤差率: {error_rate*100:.2f}%）"
+            code = FEEDBACK_WRONG
             
         return GradingResult(
             item=item,
             max_score=max_score,
-            earned_score=earned_score,
+            earned_score=_earned_score(max_score, code),
             standard_value=standard_value,
             student_value=student_value,
             error_rate=error_rate,
-            feedback=feedback
+            feedback=FEEDBACK_TEMPLATES[code].format(error_pct=error_rate*100)
         )
     
     def grade_answer(self, student_answer: Dict[str, float], 
@@ -127,7 +239,7 @@ class AnswerGrader:
                     standard_value=self.standard_answer[item],
                     student_value=None,
                     error_rate=float('inf'),
-                    feedback="❌ 未作答或無法辨識"
+                    feedback=FEEDBACK_TEMPLATES[FEEDBACK_UNANSWERED]
                 )
             else:
                 result = self.grade_item(
@@ -143,48 +255,280 @@ class AnswerGrader:
         
         # 繪製圖表加分
         if has_diagram:
-            diagram_bonus = 2.0
-            total_score += diagram_bonus
-            results.append(GradingResult(
-                item="相量圖繪製",
-                max_score=2.0,
-                earned_score=diagram_bonus,
-                standard_value=None,
-                student_value=None,
-                error_rate=0,
-                feedback="✅ 有繪製相量圖，展現理解（加分項）"
-            ))
+            total_score += DIAGRAM_BONUS
+            results.append(_diagram_result())
         
         return results, total_score
     
+    def cohort_items(self) -> List[str]:
+        """整批評分時各欄對應的評分項目（依評分標準順序，略過沒有標準答案的項目）"""
+        return [c.item for c in self.criteria if c.item in self.standard_answer]
+    
+    def build_answer_matrix(self, student_answers: Sequence[Dict[str, float]]) -> np.ndarray:
+        """將多位考生的答案字典轉換為 grade_cohort 使用的矩陣（未作答為 NaN）
+        
+        答案皆為浮點數時返回 float64 矩陣；含整數答案時返回保留原始數值的 object 矩陣，
+        grade_cohort 據此讓報告中的整數答案仍顯示為整數
+        """
+        items = self.cohort_items()
+        rows = [[answer.get(item, np.nan) for item in items] for answer in student_answers]
+        if any(_is_integer(value) for row in rows for value in row):
+            matrix = np.empty((len(rows), len(items)), dtype=object)
+            for row, values in enumerate(rows):
+                matrix[row, :] = values
+            return matrix
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(items))
+    
+    def grade_cohort(self, student_values,
+                     has_diagram: Union[bool, Sequence[bool]] = False,
+                     student_ids: Optional[List[str]] = None) -> CohortGradingResult:
+        """整批評分（結果與逐一呼叫 grade_answer 相同）
+        
+        Args:
+            student_values: (考生數, 項目數) 的答案矩陣，欄位順序同 cohort_items()，未作答為 NaN；
+                整數答案（整數或 object 矩陣中的 int）在報告中顯示為整數
+            has_diagram: 各考生是否繪製相量圖（或所有考生共用一個布林值）
+            student_ids: 考生編號（選填）
+        
+        Returns:
+            CohortGradingResult
+        """
+        items = self.cohort_items()
+        criteria = [c for c in self.criteria if c.item in self.standard_answer]
+        
+        integer_answers = _integer_mask(student_values)
+        values = np.asarray(student_values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(items):
+            raise ValueError(f"答案矩陣的形狀應為 (考生數, {len(items)})，實際為 {values.shape}")
+        
+        standard_values = [self.standard_answer[item] for item in items]
+        max_scores = np.array([c.max_score for c in criteria], dtype=np.float64)
+        tolerance = np.array([c.tolerance for c in criteria], dtype=np.float64)
+        
+        error_rates = _cohort_error_rates(np.array(standard_values, dtype=np.float64), values)
+        
+        # 分段給分：容許誤差內滿分、3 倍內 70%、10 倍內 30%、其餘 0 分
+        feedback_codes = np.select(
+            [error_rates <= tolerance, error_rates <= tolerance * 3, error_rates <= tolerance * 10],
+            [FEEDBACK_CORRECT, FEEDBACK_MINOR_ERROR, FEEDBACK_MAJOR_ERROR],
+            default=FEEDBACK_WRONG
+        ).astype(np.int8)
+        feedback_codes[np.isnan(values)] = FEEDBACK_UNANSWERED
+        earned_scores = max_scores * CREDIT_RATIOS[feedback_codes]
+        
+        has_diagram = np.broadcast_to(np.asarray(has_diagram, dtype=bool), (values.shape[0],)).copy()
+        
+        # 依項目順序逐欄累加（與 grade_answer 的加總順序相同，結果逐位元一致）
+        total_scores = np.zeros(values.shape[0])
+        for col in range(len(items)):
+            total_scores += earned_scores[:, col]
+        total_scores += np.where(has_diagram, DIAGRAM_BONUS, 0.0)
+        
+        return CohortGradingResult(
+            criteria=criteria,
+            standard_values=standard_values,
+            student_values=values,
+            feedback_codes=feedback_codes,
+            has_diagram=has_diagram,
+            total_scores=total_scores,
+            student_ids=student_ids,
+            integer_answers=integer_answers
+        )
+    
     def generate_report(self, results: List[GradingResult], total_score: float) -> str:
         """生成評分報告"""
-        report = "=" * 60 + "\n"
-        report += "答案評分報告\n"
-        report += "=" * 60 + "\n\n"
+        return _render_report(results, total_score)
+    
+    def write_reports(self, cohort: CohortGradingResult, output_path: str,
+                      chunk_size: int = 500, workers: int = 0) -> int:
+        """將整批考生的評分報告逐一寫入檔案
+        
+        報告分塊產生、產生一塊寫一塊，不會同時把所有報告留在記憶體中。
         
-        max_possible = sum(r.max_score for r in results)
+        Args:
+            cohort: grade_cohort 的評分結果
+            output_path: 輸出資料夾（每位考生一個 .txt），或 .zip 壓縮檔路徑
+            chunk_size: 每塊考生數
+            workers: 產生報告的子行程數量（0 表示在主行程中依序產生）
+        
+        Returns:
+            寫入的報告數
         
-        for result in results:
-            report += f"項目: {result.item}\n"
-            report += f"配分: {result.max_score}分\n"
-            report += f"得分: {result.earned_score}分\n"
+        Raises:
+            ValueError: 考生編號清理成檔名後重複（寫入任何報告前檢查）
+        """
+        _check_report_names(cohort)
+        chunks = ((start, min(start + chunk_size, len(cohort))) for start in range(0, len(cohort), chunk_size))
+        written = 0
+        
+        with _ReportSink(output_path) as sink:
+            if workers <= 0:
+                for start, stop in chunks:
+                    for name, report in _render_report_chunk(cohort.subset(start, stop), start):
+                        sink.write(name, report)
+                        written += 1
+                return written
             
-            if result.standard_value is not None:
-                report += f"標準答案: {result.standard_value}\n"
-            if result.student_value is not None:
-                report += f"考生答案: {result.student_value}\n"
-                if result.error_rate != float('inf'):
-                    report += f"誤差率: {result.error_rate*100:.2f}%\n"
-                    
-            report += f"評語: {result.feedback}\n"
-            report += "-" * 60 + "\n"
+            # 各塊依序送出，最多同時 2 * workers 塊在處理中，依原順序寫入
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = deque()
+                for start, stop in chunks:
+                    pending.append(pool.submit(_render_report_chunk, cohort.subset(start, stop), start))
+                    if len(pending) < 2 * workers:
+                        continue
+                    for name, report in pending.popleft().result():
+                        sink.write(name, report)
+                        written += 1
+                
+                while pending:
+                    for name, report in pending.popleft().result():
+                        sink.write(name, report)
+                        written += 1
         
-        report += f"\n總分: {total_score:.1f} / {max_possible:.1f}\n"
-        report += f"百分比: {(total_score/max_possible*100):.1f}%\n"
-        report += "=" * 60 + "\n"
+        return written
+
+
+
+# 評分報告範本
+_REPORT_RULE = "=" * 60 + "\n"
+_REPORT_HEADER = _REPORT_RULE + "答案評分報告\n" + _REPORT_RULE + "\n"
+_REPORT_ITEM = "項目: {}\n配分: {}分\n得分: {}分\n"
+_REPORT_STANDARD = "標準答案: {}\n"
+_REPORT_STUDENT = "考生答案: {}\n"
+_REPORT_ERROR_RATE = "誤差率: {:.2f}%\n"
+_REPORT_FEEDBACK = "評語: {}\n" + "-" * 60 + "\n"
+_REPORT_FOOTER = "\n總分: {:.1f} / {:.1f}\n百分比: {:.1f}%\n" + _REPORT_RULE
+
+
+def _render_report(results: List[GradingResult], total_score: float) -> str:
+    """依報告範本產生評分報告文字"""
+    parts = [_REPORT_HEADER]
+    max_possible = sum(r.max_score for r in results)
+    
+    for result in results:
+        parts.append(_REPORT_ITEM.format(result.item, result.max_score, result.earned_score))
         
-        return report
+        if result.standard_value is not None:
+            parts.append(_REPORT_STANDARD.format(result.standard_value))
+        if result.student_value is not None:
+            parts.append(_REPORT_STUDENT.format(result.student_value))
+            if result.error_rate != float('inf'):
+                parts.append(_REPORT_ERROR_RATE.format(result.error_rate*100))
+                
+        parts.append(_REPORT_FEEDBACK.format(result.feedback))
+    
+    parts.append(_REPORT_FOOTER.format(total_score, max_possible, total_score/max_possible*100))
+    return "".join(parts)
+
+
+def _render_report_chunk(cohort: CohortGradingResult, start: int) -> List[Tuple[str, str]]:
+    """產生一塊考生的評分報告（可在子行程執行）：返回 [(檔名, 報告文字)]"""
+    reports = []
+    for index in range(len(cohort)):
+        name = _report_name(cohort.student_ids[index] if cohort.student_ids is not None else None, start + index + 1)
+        reports.append((name, _render_report(*cohort.student_results(index))))
+    return reports
+
+
+def _report_name(student_id: Optional[str], number: int) -> str:
+    """報告檔名：考生編號只保留英數字與 ._-（去除路徑），沒有編號時使用流水號"""
+    if student_id is not None:
+        safe = re.sub(r'[^0-9A-Za-z._-]+', '_', os.path.basename(str(student_id)))[:80]
+        if safe.strip('.'):
+            return f"{safe}.txt"
+    return f"{number:06d}.txt"
+
+
+def _check_report_names(cohort: CohortGradingResult):
+    """檢查所有報告檔名不重複，避免後寫入的報告覆蓋前一份（或在 zip 中產生重複項目）"""
+    if cohort.student_ids is None:
+        return
+    
+    seen = {}
+    for number, student_id in enumerate(cohort.student_ids, 1):
+        name = _report_name(student_id, number)
+        if name in seen:
+            raise ValueError(f"考生編號 {seen[name]!r} 與 {student_id!r} 的報告檔名重複：{name}")
+        seen[name] = student_id
+
+
+class _ReportSink:
+    """評分報告輸出：資料夾（每份報告一個檔案）或單一 zip 壓縮檔"""
+    
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self._archive = None
+    
+    def __enter__(self):
+        if self.output_path.lower().endswith('.zip'):
+            parent = os.path.dirname(self.output_path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            self._archive = zipfile.ZipFile(self.output_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        else:
+            os.makedirs(self.output_path, exist_ok=True)
+        return self
+    
+    def write(self, name: str, report: str):
+        if self._archive is not None:
+            self._archive.writestr(name, report.encode('utf-8'))
+        else:
+            with open(os.path.join(self.output_path, name), 'w', encoding='utf-8') as f:
+                f.write(report)
+    
+    def __exit__(self, *exc_info):
+        if self._archive is not None:
+            self._archive.close()
+
+
+def _earned_score(max_score: float, code: int) -> float:
+    """依評語代碼計算得分"""
+    if code == FEEDBACK_CORRECT:
+        return max_score
+    if code == FEEDBACK_MINOR_ERROR:
+        return max_score * 0.7
+    if code == FEEDBACK_MAJOR_ERROR:
+        return max_score * 0.3
+    return 0
+
+
+def _diagram_result() -> GradingResult:
+    """相量圖加分項"""
+    return GradingResult(
+        item="相量圖繪製",
+        max_score=DIAGRAM_BONUS,
+        earned_score=DIAGRAM_BONUS,
+        standard_value=None,
+        student_value=None,
+        error_rate=0,
+        feedback="✅ 有繪製相量圖，展現理解（加分項）"
+    )
+
+
+def _is_integer(value) -> bool:
+    """答案是否為整數（Python int 或 NumPy 整數；bool 除外）"""
+    return isinstance(value, (int, np.integer)) and not isinstance(value, bool)
+
+
+def _integer_mask(student_values) -> Optional[np.ndarray]:
+    """答案矩陣中原本為整數的格子（布林遮罩）；沒有整數答案時返回 None"""
+    if isinstance(student_values, np.ndarray):
+        if student_values.dtype.kind in 'iu':
+            return np.ones(student_values.shape, dtype=bool)
+        if student_values.dtype.kind != 'O':
+            return None
+    
+    mask = np.frompyfunc(_is_integer, 1, 1)(np.asarray(student_values, dtype=object)).astype(bool)
+    return mask if mask.any() else None
+
+
+def _cohort_error_rates(standard: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """整批計算誤差率：標準答案為 0 時，考生答 0 為 0、否則為 inf；未作答為 inf"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error_rates = np.abs(standard - values) / np.abs(standard)
+    error_rates = np.where(standard == 0, np.where(values != 0, np.inf, 0.0), error_rates)
+    error_rates[np.isnan(values)] = np.inf
+    return error_rates
 
 
 def example_usage():
@@ -3,8 +3,8 @@
 """
 
 import glob
-import pandas as pd
 from essay_grading_system import EssayGradingSystem
+from batch_runner import BatchGradingRunner
 from tqdm import tqdm
 
 def main():
@@ -28,32 +28,31 @@ def main():
     print(f"\n找到 {len(image_files)} 篇作文")
     print("開始批次批改...\n")
     
-    # 批次處理
-    results = []
+    # 批次處理（每次將多張圖片一起送入 ICR 模型，前處理由子行程執行，
+    # 每完成一篇即寫入 results/batch/，中斷後重新執行會從上次進度繼續）
+    runner = BatchGradingRunner(
+        system,
+        output_dir='results/batch',
+        chunk_size=8,
+        workers=4
+    )
     
-    for image_path in tqdm(image_files, desc="批改進度"):
-        try:
-            result = system.grade_essay_from_image(image_path)
-            
-            # 儲存結果
-            results.append({
-                'file': image_path,
-                'total_score': result['scores']['total'],
-                'grade': result['scores']['grade'],
-                'content': result['scores']['content'],
-                'structure': result['scores']['structure'],
-                'grammar': result['scores']['grammar'],
-                'vocabulary': result['scores']['vocabulary'],
-                'char_count': result['features']['char_count'],
-                'sentence_count': result['features']['sentence_count'],
-            })
-            
-        except Exception as e:
-            print(f"\n⚠️  批改 {image_path} 時發生錯誤：{str(e)}")
-            continue
+    done = runner.completed()
+    remaining = sum(1 for path in image_files if path not in done)
+    if remaining < len(image_files):
+        print(f"已完成 {len(image_files) - remaining} 篇，從上次進度繼續")
+    
+    with tqdm(total=remaining, desc="批改進度") as progress:
+        summary = runner.run(image_files, on_result=lambda path, result: progress.update(1))
+    
+    if summary['failed']:
+        print(f"\n⚠️  {summary['failed']} 篇批改失敗，詳見 {runner.errors_path}")
     
     # 轉換為 DataFrame
-    df = pd.DataFrame(results)
+    df = runner.to_dataframe()
+    if df.empty:
+        print("\n❌ 沒有任何批改成功的作文")
+        return
     
     # 顯示統計
     print("\n" + "="*60)
@@ -4,15 +4,18 @@
 """
 
 import pandas as pd
-from essay_grading_system import EssayGradingSystem, EssayGradingEvaluator
+from essay_grading_system import EssayGradingSystem, EssayGradingEvaluator, OCRResultCache
 
 def main():
     print("="*60)
     print("範例 3：系統效能評估")
     print("="*60)
     
-    # 初始化
-    system = EssayGradingSystem(languages=['ch_sim', 'en'])
+    # 初始化（啟用 OCR 快取，重複評估同一批作文時不必重新辨識）
+    system = EssayGradingSystem(
+        languages=['ch_sim', 'en'],
+        ocr_cache=OCRResultCache('results/ocr_cache')
+    )
     evaluator = EssayGradingEvaluator()
     
     # 方式 1：從 CSV 讀取真實標籤
@@ -45,6 +48,9 @@ def main():
             except Exception as e:
                 print(f"  ⚠️  跳過 {row['image_path']}: {str(e)}")
         
+        cache_stats = system.ocr_cache.stats()
+        print(f"\n  OCR 快取：命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次")
+        
     except FileNotFoundError:
         print(f"\n⚠️  找不到 {csv_file}")
         print("\n使用方式 2：手動模擬資料")
@@ -80,7 +86,8 @@ def main():
     print("正在計算評估指標...")
     print("="*60)
     
-    metrics = evaluator.calculate_metrics()
+    # 驗證資料通常不多，另以 2000 次自助法重抽估計信賴區間
+    metrics = evaluator.calculate_metrics(bootstrap=2000, seed=0)
     
     # 列印詳細報告
     evaluator.print_summary(metrics)
@@ -88,22 +95,15 @@ def main():
     # 繪製圖表
     print("\n正在生成視覺化圖表...")
     
+    # 在背景行程繪製（不開啟視窗），指標未變時不會重新繪製
+    report = evaluator.render_reports_async(metrics, output_dir='results')
+    
     try:
-        # 混淆矩陣
-        evaluator.plot_confusion_matrix(
-            metrics, 
-            save_path='results/confusion_matrix.png'
-        )
-        
-        # 指標比較圖
-        evaluator.plot_metrics_comparison(
-            metrics,
-            save_path='results/metrics_comparison.png'
-        )
+        paths = report.result()
         
         print("\n✅ 圖表已儲存！")
-        print("  • results/confusion_matrix.png")
-        print("  • results/metrics_comparison.png")
+        for path in paths.values():
+            print(f"  • {path}")
         
     except Exception as e:
         print(f"\n⚠️  繪製圖表時發生錯誤：{str(e)}")
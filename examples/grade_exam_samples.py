@@ -8,9 +8,9 @@ import os
 from datetime import datetime
 from essay_grading_system import EssayGradingSystem, EssayGradingEvaluator
 
-# PDF 處理
+# PDF 處理（由 EssayGradingSystem.grade_essay_from_pdf 使用）
 try:
-    from pdf2image import convert_from_path
+    import pdf2image
     PDF_SUPPORT = True
 except ImportError:
     PDF_SUPPORT = False
@@ -19,23 +19,6 @@ except ImportError:
     print("   Windows 還需要安裝 poppler")
 
 
-def pdf_to_image(pdf_path, output_dir='temp'):
-    """將 PDF 轉換為圖片"""
-    if not PDF_SUPPORT:
-        raise ImportError("需要安裝 pdf2image")
-    
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 轉換 PDF 第一頁為圖片
-    images = convert_from_path(pdf_path, first_page=1, last_page=1, dpi=300)
-    
-    if images:
-        image_path = os.path.join(output_dir, f"{os.path.basename(pdf_path)}.jpg")
-        images[0].save(image_path, 'JPEG')
-        return image_path
-    
-    return None
-
 def process_exam_essays():
     """處理大考中心作文範本"""
     
@@ -80,7 +63,6 @@ def process_exam_essays():
         print("-" * 60)
         
         try:
-            # 如果是 PDF，先轉換為圖片
             file_path = essay_info['file']
             if file_path.endswith('.pdf'):
                 if not PDF_SUPPORT:
@@ -88,16 +70,14 @@ def process_exam_essays():
                     print()
                     continue
                 
-                print(f"  正在轉換 PDF 為圖片...")
-                file_path = pdf_to_image(file_path)
-                if not file_path:
-                    print(f"✗ PDF 轉換失敗")
-                    print()
-                    continue
-                print(f"  ✓ 轉換完成")
-            
-            # 批改作文
-            result = system.grade_essay_from_image(file_path)
+                if not os.path.exists(file_path):
+                    raise FileNotFoundError(file_path)
+                
+                # 批改作文（PDF 所有頁面直接在記憶體中轉換並辨識）
+                result = system.grade_essay_from_pdf(file_path)
+            else:
+                # 批改作文
+                result = system.grade_essay_from_image(file_path)
             
             # 整理結果
             essay_result = {
@@ -111,7 +91,12 @@ def process_exam_essays():
                 'icr': {
                     'recognized_text': result['text'][:200] + '...' if len(result['text']) > 200 else result['text'],
                     'confidence': round(result['icr_result']['confidence'], 4),
-                    'word_count': result['icr_result']['word_count']
+                    'word_count': result['icr_result']['word_count'],
+                    'recognition_time_seconds': round(sum(
+                        seconds for stage, seconds in result['timings'].items()
+                        if stage not in ('analysis', 'scoring')
+                    ), 2),
+                    'timings': {stage: round(seconds, 4) for stage, seconds in result['timings'].items()}
                 },
                 
                 # 作文特徵
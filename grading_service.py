@@ -0,0 +1,331 @@
+"""
+作文批改 HTTP 服務
+以 asyncio（aiohttp）實作，整個服務共用一個 EssayGradingSystem 與 ICR 模型，
+並將同時送達的多個請求合併成動態批次後再送入 OCR 模型（micro-batching）。
+
+啟動方式：
+    pip install aiohttp
+    python grading_service.py --port 5000 --max-batch-size 16 --max-wait-ms 50
+
+使用方式：
+    curl -X POST -F "image=@essay.jpg" http://localhost:5000/grade
+    curl -X POST -F "pdf=@原卷1-1.pdf" http://localhost:5000/grade/pdf
+    curl -X POST -H "Content-Type: application/json" \\
+         -d '{"text": "作文內容"}' http://localhost:5000/grade/text
+    curl http://localhost:5000/metrics    # 各階段耗時（Prometheus 文字格式）
+"""
+
+import argparse
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from essay_grading_system import EssayGradingSystem, load_pdf_pages
+
+
+class OCRMicroBatcher:
+    """
+    跨請求的 OCR 動態批次器
+    
+    各請求先在自己的執行緒中完成前處理（EssayGradingSystem.prepare_page），
+    再將準備好的頁面放入佇列等待結果；背景工作從佇列取出頁面，
+    湊滿 max_batch_size 頁或等待超過 max_wait 秒即送出一批，
+    在單一執行緒中呼叫 recognize_prepared，模型執行緒只做偵測與辨識，也避免多個請求同時搶用模型。
+    """
+    
+    def __init__(self, system: EssayGradingSystem,
+                 max_batch_size: int = 16,
+                 max_wait: float = 0.05):
+        """
+        system: 共用的批改系統
+        max_batch_size: 每批最多頁數
+        max_wait: 第一頁進入佇列後最多等待的秒數
+        """
+        self.system = system
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        
+        # 模型只在這個執行緒中執行
+        self._model_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ocr')
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        
+        # 統計
+        self.batch_count = 0
+        self.page_count = 0
+    
+    async def start(self):
+        """啟動背景批次工作，並預先載入 ICR 模型"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._model_executor, lambda: self.system.reader)
+        
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """停止背景批次工作"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._model_executor.shutdown(wait=True)
+    
+    async def recognize(self, page: Dict) -> Dict:
+        """辨識一頁 prepare_page 準備好的頁面，返回格式同 icr_recognize_batch 的結果"""
+        if 'result' in page:
+            # 快取命中、分流或錯誤，不需送進模型
+            return page['result']
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((page, future))
+        return await future
+    
+    async def _collect(self) -> List[Tuple[object, asyncio.Future]]:
+        """收集一批頁面：湊滿 max_batch_size 或等待逾時為止"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        return batch
+    
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        
+        while True:
+            batch = await self._collect()
+            pages = [page for page, _ in batch]
+            
+            try:
+                results = await loop.run_in_executor(
+                    self._model_executor,
+                    lambda: self.system.recognize_prepared(pages)
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            self.batch_count += 1
+            self.page_count += len(pages)
+            
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+    
+    def stats(self) -> Dict:
+        """批次統計"""
+        return {
+            'batches': self.batch_count,
+            'pages': self.page_count,
+            'avg_batch_size': self.page_count / self.batch_count if self.batch_count else 0,
+            'queued': self._queue.qsize() if self._queue is not None else 0
+        }
+
+
+class GradingService:
+    """作文批改 HTTP 服務"""
+    
+    def __init__(self, system: EssayGradingSystem,
+                 max_batch_size: int = 16,
+                 max_wait: float = 0.05,
+                 decode_workers: Optional[int] = None):
+        """
+        system: 共用的批改系統
+        max_batch_size / max_wait: OCR 動態批次設定
+        decode_workers: 解碼圖片、轉換 PDF 與前處理的執行緒數
+        """
+        self.system = system
+        self.batcher = OCRMicroBatcher(system, max_batch_size=max_batch_size, max_wait=max_wait)
+        self._decode_executor = ThreadPoolExecutor(
+            max_workers=decode_workers or os.cpu_count() or 1,
+            thread_name_prefix='decode'
+        )
+    
+    def create_app(self):
+        """建立 aiohttp 應用程式"""
+        from aiohttp import web
+        
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post('/grade', self.handle_image)
+        app.router.add_post('/grade/pdf', self.handle_pdf)
+        app.router.add_post('/grade/text', self.handle_text)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+    
+    async def _on_startup(self, app):
+        await self.batcher.start()
+    
+    async def _on_cleanup(self, app):
+        await self.batcher.stop()
+        self._decode_executor.shutdown(wait=True)
+    
+    async def _read_upload(self, request, field: str) -> Optional[bytes]:
+        """讀取 multipart 上傳欄位的內容"""
+        reader = await request.multipart()
+        async for part in reader:
+            if part.name == field:
+                return await part.read()
+        return None
+    
+    async def handle_image(self, request):
+        """POST /grade：上傳作文圖片（欄位 image）"""
+        from aiohttp import web
+        
+        data = await self._read_upload(request, 'image')
+        if not data:
+            return web.json_response({'error': 'No image provided'}, status=400)
+        
+        loop = asyncio.get_running_loop()
+        image = await loop.run_in_executor(self._decode_executor, _decode_image, data)
+        if image is None:
+            return web.json_response({'error': '無法解碼圖片'}, status=400)
+        
+        page = await loop.run_in_executor(self._decode_executor, self.system.prepare_page, image)
+        icr_result = await self.batcher.recognize(page)
+        if 'error' in icr_result:
+            self.system.metrics.inc('essays_failed')
+            return web.json_response({'error': icr_result['error']}, status=422)
+        
+        return web.json_response(self._grade('<upload>', icr_result))
+    
+    async def handle_pdf(self, request):
+        """POST /grade/pdf：上傳 PDF 作答本（欄位 pdf），所有頁面視為同一篇作文"""
+        from aiohttp import web
+        
+        data = await self._read_upload(request, 'pdf')
+        if not data:
+            return web.json_response({'error': 'No pdf provided'}, status=400)
+        
+        loop = asyncio.get_running_loop()
+        try:
+            pages = await loop.run_in_executor(self._decode_executor, load_pdf_pages, data)
+        except Exception as e:
+            return web.json_response({'error': f'無法轉換 PDF：{e}'}, status=400)
+        
+        # 各頁分別前處理後進入批次佇列，可與其他請求的頁面合併辨識
+        prepared = await asyncio.gather(*(
+            loop.run_in_executor(self._decode_executor, self.system.prepare_page, page) for page in pages
+        ))
+        page_results = await asyncio.gather(*(self.batcher.recognize(page) for page in prepared))
+        
+        try:
+            icr_result = self.system.merge_page_results(list(page_results))
+        except ValueError as e:
+            self.system.metrics.inc('essays_failed')
+            return web.json_response({'error': str(e)}, status=422)
+        
+        response = self._grade('<upload.pdf>', icr_result)
+        response['page_count'] = icr_result['page_count']
+        return web.json_response(response)
+    
+    async def handle_text(self, request):
+        """POST /grade/text：直接對文字評分（JSON {"text": ...}），不經過 OCR"""
+        from aiohttp import web
+        
+        try:
+            body = await request.json()
+        except ValueError:
+            return web.json_response({'error': 'Invalid JSON'}, status=400)
+        
+        text = body.get('text') if isinstance(body, dict) else None
+        if not isinstance(text, str):
+            return web.json_response({'error': 'No text provided'}, status=400)
+        
+        features = self.system.analyze_essay(text)
+        scores = self.system.score_essay(text, features)
+        return web.json_response(_format_response(scores, features))
+    
+    async def handle_health(self, request):
+        """GET /health：服務狀態與批次統計"""
+        from aiohttp import web
+        
+        return web.json_response({'status': 'ok', 'batching': self.batcher.stats()})
+    
+    async def handle_metrics(self, request):
+        """GET /metrics：各階段耗時直方圖與計數器（Prometheus 文字格式）"""
+        from aiohttp import web
+        
+        # Prometheus 由 Content-Type 的 version 參數判斷文字格式版本
+        return web.Response(
+            body=self.system.metrics.to_prometheus().encode('utf-8'),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+        )
+    
+    def _grade(self, label: str, icr_result: Dict) -> Dict:
+        """由辨識結果評分並整理回應內容（各階段耗時同時計入統計）"""
+        result = self.system.grade_icr_result(label, icr_result)
+        
+        response = _format_response(result['scores'], result['features'])
+        response['text'] = result['text']
+        response['confidence'] = float(icr_result['confidence'])
+        response['timings'] = result['timings']
+        return response
+
+
+def _decode_image(data: bytes):
+    """將上傳的圖片內容解碼為 BGR 圖片陣列；無法解碼時返回 None"""
+    import cv2
+    import numpy as np
+    
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def _format_response(scores: Dict, features: Dict) -> Dict:
+    """整理評分回應（欄位與 README 的 API 範例一致）"""
+    return {
+        'total_score': scores['total'],
+        'grade': scores['grade'],
+        'content': scores['content'],
+        'structure': scores['structure'],
+        'grammar': scores['grammar'],
+        'vocabulary': scores['vocabulary'],
+        'features': features
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AI 作文批改 HTTP 服務')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--languages', nargs='+', default=['ch_sim', 'en'])
+    parser.add_argument('--cpu', action='store_true', help='不使用 GPU')
+    parser.add_argument('--cpu-threads', type=int, help='PyTorch / OpenCV 執行緒數（同機多個服務時設為 核心數 / 服務數）')
+    parser.add_argument('--no-quantize', action='store_true', help='CPU 模式下停用 EasyOCR 預設的 int8 量化（使用 float32 辨識器）')
+    parser.add_argument('--max-batch-size', type=int, default=16, help='每批最多頁數')
+    parser.add_argument('--max-wait-ms', type=float, default=50, help='湊批次的最長等待時間（毫秒）')
+    args = parser.parse_args()
+    
+    from aiohttp import web
+    
+    system = EssayGradingSystem(
+        languages=args.languages,
+        gpu=not args.cpu,
+        quantize=not args.no_quantize,
+        cpu_threads=args.cpu_threads
+    )
+    service = GradingService(
+        system,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000
+    )
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()